@@ -1,9 +1,10 @@
 #!/usr/bin/env python
 import asyncio
+import json
 import logging
-from typing import Callable, Dict
+from typing import Callable, Dict, Optional
 
-import requests
+import aiohttp
 
 logging.basicConfig(format="%(asctime)s - %(name)s - %(levelname)s - %(message)s", level=logging.INFO)
 logger = logging.getLogger(__name__)
@@ -12,9 +13,152 @@ headers = {"Content-Type": "application/json;charset=utf-8"}
 
 
 class BatchConnector:
-    def __init__(self, url: str):
+    def __init__(self, url: str, pool_size: int = 100, timeout: float = 10.0, retries: int = 2):
         self._url = url
+        self._pool_size = pool_size
+        self._timeout = aiohttp.ClientTimeout(total=timeout)
+        self._retries = retries
+        self._session: Optional[aiohttp.ClientSession] = None
+
+    def _get_session(self) -> aiohttp.ClientSession:
+        # session has to be created inside of the running event loop, so it is done lazily on the first call
+        if self._session is None or self._session.closed:
+            connector = aiohttp.TCPConnector(limit=self._pool_size, keepalive_timeout=60)
+            self._session = aiohttp.ClientSession(connector=connector, headers=headers, timeout=self._timeout)
+        return self._session
+
+    async def _post(self, payload: Dict):
+        session = self._get_session()
+        for attempt in range(self._retries + 1):
+            try:
+                async with session.post(self._url, json=payload) as resp:
+                    resp.raise_for_status()
+                    return await resp.json()
+            except (aiohttp.ClientError, asyncio.TimeoutError) as e:
+                if attempt == self._retries:
+                    raise
+                logger.warning(f"{self._url} request failed ({e!r}), retry {attempt + 1}/{self._retries}")
+
+    async def send(self, payload: Dict, callback: Callable):
+        try:
+            emotion_result = await self._post(payload["payload"])
+            response = {"batch": emotion_result}
+        except Exception as e:
+            logger.exception(e)
+            response = e
+        asyncio.create_task(callback(task_id=payload["task_id"], response=response))
+
+    async def close(self):
+        if self._session is not None and not self._session.closed:
+            await self._session.close()
+
+
+class MicroBatchConnector(BatchConnector):
+    """Gathers payloads of concurrent dialogs and forwards them to the service in one request.
+
+    Every list in the formatted payload (e.g. `sentences`, `x`, `dialogs`) is concatenated across dialogs,
+    the service response is sliced back and passed to the callback of each `task_id`. Payloads with other
+    values of the keys which are not lists are sent in separate requests.
+
+    Args:
+        url: service url
+        max_batch_size: max number of samples in one request to the service
+        max_wait_ms: how long to wait for other dialogs after the first payload arrived
+        batch_response: wrap responses into `{"batch": ...}` like BatchConnector does (for response annotators),
+            otherwise the first sample of the dialog is returned like the default http connector does
+    """
+
+    def __init__(
+        self,
+        url: str,
+        max_batch_size: int = 32,
+        max_wait_ms: float = 10.0,
+        batch_response: bool = False,
+        pool_size: int = 100,
+        timeout: float = 10.0,
+        retries: int = 2,
+    ):
+        super().__init__(url, pool_size=pool_size, timeout=timeout, retries=retries)
+        self._max_batch_size = max_batch_size
+        self._max_wait = max_wait_ms / 1000
+        self._batch_response = batch_response
+        self._queue: Optional[asyncio.Queue] = None
+        self._worker: Optional[asyncio.Task] = None
 
     async def send(self, payload: Dict, callback: Callable):
-        emotion_result = requests.request(url=self._url, headers=headers, json=payload["payload"], method="POST").json()
-        asyncio.create_task(callback(task_id=payload["task_id"], response={"batch": emotion_result}))
+        if self._worker is None or self._worker.done():
+            self._queue = asyncio.Queue()
+            self._worker = asyncio.create_task(self._collect())
+        await self._queue.put((payload, callback))
+
+    @staticmethod
+    def _batch_len(payload: Dict) -> int:
+        return max((len(value) for value in payload.values() if isinstance(value, list)), default=1)
+
+    async def _collect(self):
+        loop = asyncio.get_running_loop()
+        while True:
+            batch = [await self._queue.get()]
+            size = self._batch_len(batch[0][0]["payload"])
+            deadline = loop.time() + self._max_wait
+            while size < self._max_batch_size:
+                timeout = deadline - loop.time()
+                if timeout <= 0:
+                    break
+                try:
+                    item = await asyncio.wait_for(self._queue.get(), timeout)
+                except asyncio.TimeoutError:
+                    break
+                batch.append(item)
+                size += self._batch_len(item[0]["payload"])
+            # several batches can be in flight at the same time, collecting goes on
+            asyncio.create_task(self._flush(batch))
+
+    @staticmethod
+    def _merge_key(payload: Dict) -> str:
+        # payloads are merged only if they have the same list keys and the same values of the other keys
+        list_keys = sorted(key for key, value in payload.items() if isinstance(value, list))
+        other_values = {key: value for key, value in payload.items() if not isinstance(value, list)}
+        return json.dumps([list_keys, other_values], sort_keys=True, default=str)
+
+    async def _flush(self, batch):
+        groups = {}
+        for payload, callback in batch:
+            if self._batch_len(payload["payload"]) == 0:
+                # there are no samples to take the response of the dialog from
+                if self._batch_response:
+                    response = {"batch": []}
+                else:
+                    response = ValueError(f"{self._url}: payload of task {payload['task_id']} has no samples")
+                asyncio.create_task(callback(task_id=payload["task_id"], response=response))
+                continue
+            groups.setdefault(self._merge_key(payload["payload"]), []).append((payload, callback))
+        await asyncio.gather(*(self._flush_group(group) for group in groups.values()))
+
+    async def _flush_group(self, group):
+        merged = {}
+        for payload, _ in group:
+            for key, value in payload["payload"].items():
+                if isinstance(value, list):
+                    merged.setdefault(key, []).extend(value)
+                else:
+                    merged[key] = value
+        lengths = [self._batch_len(payload["payload"]) for payload, _ in group]
+        try:
+            result = await self._post(merged)
+            if not isinstance(result, list) or len(result) < sum(lengths):
+                raise ValueError(f"{self._url} returned {result!r:.200} for {sum(lengths)} samples")
+            responses = []
+            offset = 0
+            for length in lengths:
+                if self._batch_response:
+                    responses.append({"batch": result[offset : offset + length]})
+                else:
+                    responses.append(result[offset])
+                offset += length
+        except Exception as e:
+            logger.exception(e)
+            responses = [e] * len(group)
+
+        for (payload, callback), response in zip(group, responses):
+            asyncio.create_task(callback(task_id=payload["task_id"], response=response))
@@ -58,7 +58,13 @@ def hypotheses_list(dialog: Dict) -> Dict:
 
 
 def programy_formatter_dialog(dialog: Dict) -> List:
-    return [{"sentences_batch": [[u["text"] for u in dialog["utterances"][-5:]]]}]
+    return [
+        {
+            "sentences_batch": [[u["text"] for u in dialog["utterances"][-5:]]],
+            "dialog_ids": [dialog.get("dialog_id", dialog.get("id"))],
+            "utterances_counts": [len(dialog["utterances"])],
+        }
+    ]
 
 
 def skill_with_attributes_formatter_service(payload: Dict):
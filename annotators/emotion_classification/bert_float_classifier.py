@@ -12,16 +12,24 @@
 # See the License for the specific language governing permissions and
 # limitations under the License.
 
+import json
 import logging
+import threading
+from abc import ABC, abstractmethod
+from collections import OrderedDict
 from os import getenv
-from typing import List, Union
+from typing import List, Optional, Union
 
+import numpy as np
 import sentry_sdk
+import tensorflow as tf
 from bert_dp.preprocessing import InputFeatures
-from overrides import overrides
 
+from deeppavlov.core.commands.utils import expand_path
 from deeppavlov.core.common.registry import register
+from deeppavlov.core.models.component import Component
 from deeppavlov.models.bert.bert_classifier import BertClassifierModel
+from deeppavlov.models.preprocessors.bert_preprocessor import BertPreprocessor
 
 sentry_sdk.init(getenv("SENTRY_DSN"))
 
@@ -29,13 +37,11 @@ logging.basicConfig(format="%(asctime)s - %(name)s - %(levelname)s - %(message)s
 logger = logging.getLogger(__name__)
 
 
-@register("emotion_classification")
-class BertFloatClassifierModel(BertClassifierModel):
+class CachedBucketedPredictor(ABC):
     """
-    Bert-based model for text classification with floating point values
-
-    It uses output from [CLS] token and predicts labels using linear transformation.
+    Text-keyed prediction cache and length-bucketed inference shared by the checkpoint and the frozen graph models.
 
+    Subclasses implement `_run_bucket` which returns predictions for arrays of a bucket.
     """
 
     all_columns = ["anger", "fear", "joy", "love", "sadness", "surprise", "neutral"]
@@ -43,7 +49,122 @@ class BertFloatClassifierModel(BertClassifierModel):
 
     # map2base_sentiment = []  # {"neutral": "neutral", "very_positive": "positive", "very_negative": "negative"}
 
-    def __init__(self, **kwargs) -> None:
+    def _init_cache(
+        self,
+        bucket_size: int,
+        cache_size: int,
+        warmup_path: Optional[str],
+        vocab_file: Optional[str],
+        do_lower_case: bool,
+        max_seq_length: int,
+    ) -> None:
+        self.bucket_size = bucket_size
+        self.cache_size = cache_size
+        self.cache = OrderedDict()
+        # riseapi runs requests in a thread pool, the cache is locked but the model is run outside of the lock
+        self._cache_lock = threading.Lock()
+        if warmup_path and vocab_file and expand_path(warmup_path).exists():
+            texts = [line.strip() for line in expand_path(warmup_path).read_text().splitlines() if line.strip()]
+            preprocessor = BertPreprocessor(vocab_file, do_lower_case=do_lower_case, max_seq_length=max_seq_length)
+            for start in range(0, len(texts), self.bucket_size):
+                batch = texts[start : start + self.bucket_size]
+                self(preprocessor(batch), batch)
+            logger.info(f"emotion cache is warmed up with {len(self.cache)} texts")
+
+    def __call__(
+        self, features: List[InputFeatures], texts: Optional[List[str]] = None
+    ) -> Union[List[int], List[List[float]]]:
+        """
+        Make prediction for given features (texts).
+
+        Args:
+            features: batch of InputFeatures
+            texts: texts of features used as keys of the cache
+
+        Returns:
+            predicted classes or probabilities of each class
+
+        """
+        if texts is None or not self.cache_size:
+            return self._predict(features)
+
+        with self._cache_lock:
+            predictions = [self.cache.get(text) for text in texts]
+        # each unseen text is classified once
+        misses = {text: i for i, (text, pred) in enumerate(zip(texts, predictions)) if pred is None}
+        if misses:
+            new_predictions = dict(zip(misses, self._predict([features[i] for i in misses.values()])))
+            predictions = [new_predictions.get(text, pred) for text, pred in zip(texts, predictions)]
+        with self._cache_lock:
+            # texts are put back, other requests may have evicted them meanwhile
+            for text, pred in zip(texts, predictions):
+                self.cache[text] = pred
+                self.cache.move_to_end(text)
+            while len(self.cache) > self.cache_size:
+                self.cache.popitem(last=False)
+        return [dict(pred) for pred in predictions]
+
+    @abstractmethod
+    def _run_bucket(self, input_ids: np.ndarray, input_masks: np.ndarray, input_type_ids: np.ndarray) -> np.ndarray:
+        """Returns predictions of the bucket, arrays are trimmed to the longest sequence of the bucket"""
+
+    def _predict(self, features: List[InputFeatures]) -> Union[List[int], List[List[float]]]:
+        """
+        Features are sorted by the real length, split into buckets of `bucket_size`
+        and every bucket is trimmed to its longest sequence instead of `max_seq_length`.
+        """
+        if not features:
+            return []
+        input_ids = np.array([f.input_ids for f in features])
+        input_masks = np.array([f.input_mask for f in features])
+        input_type_ids = np.array([f.input_type_ids for f in features])
+
+        lengths = input_masks.sum(axis=1)
+        order = np.argsort(lengths, kind="stable")
+        pred = None
+        for start in range(0, len(order), self.bucket_size):
+            bucket = order[start : start + self.bucket_size]
+            max_len = max(int(lengths[bucket].max()), 1)
+            bucket_pred = self._run_bucket(
+                input_ids[bucket, :max_len], input_masks[bucket, :max_len], input_type_ids[bucket, :max_len]
+            )
+            if pred is None:
+                pred = np.empty((len(features),) + bucket_pred.shape[1:], dtype=bucket_pred.dtype)
+            pred[bucket] = bucket_pred
+
+        # rows are converted to python floats at once, not value by value
+        batch_predictions = [dict(zip(self.used_columns, curr_pred)) for curr_pred in pred.tolist()]
+        return batch_predictions
+
+
+@register("emotion_classification")
+class BertFloatClassifierModel(CachedBucketedPredictor, BertClassifierModel):
+    """
+    Bert-based model for text classification with floating point values
+
+    It uses output from [CLS] token and predicts labels using linear transformation.
+
+    If texts are passed with features, predictions are cached by text, so repeated hypotheses
+    (templated skill responses) don't reach BERT. The cache may be warmed up with texts from `warmup_path`.
+
+    Args:
+        bucket_size: max number of samples in one forward pass
+        cache_size: max number of cached texts, least recently used ones are evicted
+        warmup_path: file with texts to classify on start, one per line
+        vocab_file, do_lower_case, max_seq_length: parameters of bert_preprocessor for warm-up texts
+
+    """
+
+    def __init__(
+        self,
+        bucket_size: int = 32,
+        cache_size: int = 10000,
+        warmup_path: Optional[str] = None,
+        vocab_file: Optional[str] = None,
+        do_lower_case: bool = False,
+        max_seq_length: int = 32,
+        **kwargs,
+    ) -> None:
         super().__init__(**kwargs)
         # FOR INIT GRAPH when training was used the following loss function
         # we have multi-label case
@@ -54,28 +175,67 @@ class BertFloatClassifierModel(BertClassifierModel):
         #
         # self.loss = tf.reduce_mean(
         #     tf.nn.sigmoid_cross_entropy_with_logits(labels=one_hot_labels, logits=logits)[chosen_inds])
+        self._init_cache(bucket_size, cache_size, warmup_path, vocab_file, do_lower_case, max_seq_length)
 
-    @overrides
-    def __call__(self, features: List[InputFeatures]) -> Union[List[int], List[List[float]]]:
-        """
-        Make prediction for given features (texts).
+    def _run_bucket(self, input_ids: np.ndarray, input_masks: np.ndarray, input_type_ids: np.ndarray) -> np.ndarray:
+        feed_dict = self._build_feed_dict(input_ids, input_masks, input_type_ids)
+        return self.sess.run(self.y_predictions if not self.return_probas else self.y_probas, feed_dict)
 
-        Args:
-            features: batch of InputFeatures
 
-        Returns:
-            predicted classes or probabilities of each class
+@register("emotion_classification_frozen")
+class FrozenBertFloatClassifierModel(CachedBucketedPredictor, Component):
+    """
+    Serving mode of the emotion classifier for CPU nodes.
 
-        """
-        logging.info(features)
-        input_ids = [f.input_ids for f in features]
-        input_masks = [f.input_mask for f in features]
-        input_type_ids = [f.input_type_ids for f in features]
+    Runs the graph exported by `export_frozen_graph.py` (variables turned into constants, constants folded,
+    optionally int8 weights) instead of building the training graph and restoring the checkpoint.
+    Predictions match `emotion_classification` within the tolerance the artifact was checked with on export.
 
-        feed_dict = self._build_feed_dict(input_ids, input_masks, input_type_ids)
-        if not self.return_probas:
-            pred = self.sess.run(self.y_predictions, feed_dict=feed_dict)
-        else:
-            pred = self.sess.run(self.y_probas, feed_dict=feed_dict)
-        batch_predictions = [{column: prob for column, prob in zip(self.used_columns, curr_pred)} for curr_pred in pred]
-        return batch_predictions
+    Args:
+        load_path: path to the frozen graph, its metadata is read from the `.json` file next to it
+        intra_op_threads, inter_op_threads: sizes of TF thread pools, TF defaults if not set
+        bucket_size, cache_size, warmup_path, vocab_file, do_lower_case, max_seq_length:
+            same as of `emotion_classification`
+
+    """
+
+    def __init__(
+        self,
+        load_path: str,
+        intra_op_threads: Optional[int] = None,
+        inter_op_threads: Optional[int] = None,
+        bucket_size: int = 32,
+        cache_size: int = 10000,
+        warmup_path: Optional[str] = None,
+        vocab_file: Optional[str] = None,
+        do_lower_case: bool = False,
+        max_seq_length: int = 32,
+        **kwargs,
+    ) -> None:
+        load_path = expand_path(load_path)
+        metadata = json.loads(load_path.with_suffix(".json").read_text())
+        graph_def = tf.GraphDef()
+        graph_def.ParseFromString(load_path.read_bytes())
+        self.graph = tf.Graph()
+        with self.graph.as_default():
+            tf.import_graph_def(graph_def, name="")
+        self.inputs = [self.graph.get_tensor_by_name(name) for name in metadata["inputs"]]
+        self.output = self.graph.get_tensor_by_name(metadata["output"])
+        self.used_columns = metadata.get("used_columns", self.used_columns)
+
+        sess_config = tf.ConfigProto(
+            intra_op_parallelism_threads=intra_op_threads or 0, inter_op_parallelism_threads=inter_op_threads or 0
+        )
+        self.sess = tf.Session(graph=self.graph, config=sess_config)
+        logger.info(
+            f"frozen graph is loaded from {load_path}, quantized: {metadata.get('quantized', False)}, "
+            f"max abs diff on export: {metadata.get('max_abs_diff')}"
+        )
+        self._init_cache(bucket_size, cache_size, warmup_path, vocab_file, do_lower_case, max_seq_length)
+
+    def _run_bucket(self, input_ids: np.ndarray, input_masks: np.ndarray, input_type_ids: np.ndarray) -> np.ndarray:
+        return self.sess.run(self.output, dict(zip(self.inputs, (input_ids, input_masks, input_type_ids))))
+
+    def destroy(self):
+        self.sess.close()
+        super().destroy()
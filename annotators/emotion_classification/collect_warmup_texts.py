@@ -0,0 +1,64 @@
+"""
+Collects fixed response texts of skills to warm up the emotion classification cache.
+
+    python collect_warmup_texts.py > warmup_texts.txt
+
+Run it from the repository copy of the service after changing AIML categories or harvesters responses.
+"""
+import ast
+import re
+import xml.etree.ElementTree as ET
+from pathlib import Path
+
+ROOT_DIR = Path(__file__).resolve().parents[2]
+AIML_DIR = ROOT_DIR / "skills/program-y/dream_aiml/storage/categories"
+HARVESTERS_SERVER = ROOT_DIR / "skills/harvesters_maintenance_skill/server.py"
+
+SSML_TAG = re.compile(r"AMAZON_EMOTION_[A-Z_]+\.?")
+# placeholders like FULL_IDS or STATUS are filled by the skill with the current data
+PLACEHOLDER = re.compile(r"\b[A-Z][A-Z_]{1,}\b")
+
+
+def template_texts(elem):
+    """Returns all texts a template element may produce or None if the output depends on the dialog"""
+    results = [elem.text or ""]
+    for child in elem:
+        if child.tag == "think":
+            options = [""]
+        elif child.tag == "random":
+            options = []
+            for item in child.findall("li"):
+                item_texts = template_texts(item)
+                if item_texts is None:
+                    return None
+                options += item_texts
+        else:
+            return None
+        results = [result + option + (child.tail or "") for result in results for option in options]
+    return results
+
+
+def aiml_texts():
+    for path in sorted(AIML_DIR.glob("*.aiml")):
+        for template in ET.parse(path).getroot().iter("template"):
+            for text in template_texts(template) or []:
+                yield SSML_TAG.sub("", " ".join(text.split())).strip()
+
+
+def harvesters_texts():
+    tree = ast.parse(HARVESTERS_SERVER.read_text())
+    for node in tree.body:
+        if isinstance(node, ast.Assign) and getattr(node.targets[0], "id", None) == "RESPONSES":
+            responses = ast.literal_eval(node.value)
+            for collection in responses.values():
+                texts = collection if isinstance(collection, list) else [collection["yes"], collection["no"]]
+                yield from (text for text in texts if not PLACEHOLDER.search(text))
+
+
+def main():
+    texts = dict.fromkeys(text for text in [*aiml_texts(), *harvesters_texts()] if text)
+    print("\n".join(texts))
+
+
+if __name__ == "__main__":
+    main()
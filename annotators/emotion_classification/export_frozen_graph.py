@@ -0,0 +1,116 @@
+"""
+Exports the emotion classifier to a frozen graph for CPU serving with `emo_bert_frozen.json`.
+
+    python export_frozen_graph.py emo_bert.json [--quantize]
+
+Variables of the checkpoint are turned into constants, `keep_prob_ph` and `is_train_ph` are fixed to their
+inference defaults, constant subgraphs are folded and, with `--quantize`, float weights are stored as int8
+(`quantize_weights` transform, weights are dequantized in the graph, so the artifact is ~4x smaller).
+The graph is saved with a `.json` file of its input and output tensor names next to it.
+
+Predictions of the artifact are compared with the checkpoint on `warmup_texts.txt` and the export fails if the max
+absolute difference of a class probability exceeds the tolerance:
+    float graph  1e-4
+    int8 weights 5e-2
+"""
+import argparse
+import json
+import logging
+from pathlib import Path
+
+import numpy as np
+import tensorflow as tf
+from tensorflow.tools.graph_transforms import TransformGraph
+
+from deeppavlov.core.commands.utils import expand_path, parse_config
+from deeppavlov.core.common.file import find_config
+from deeppavlov import build_model
+
+from bert_float_classifier import BertFloatClassifierModel, FrozenBertFloatClassifierModel
+
+logger = logging.getLogger(__name__)
+
+TOLERANCE = {False: 1e-4, True: 5e-2}
+TRANSFORMS = [
+    "remove_nodes(op=Identity, op=CheckNumerics)",
+    "fold_constants(ignore_errors=true)",
+    "fold_batch_norms",
+    "fold_old_batch_norms",
+]
+
+
+def fix_defaults(graph_def: tf.GraphDef, inputs):
+    """Replaces placeholders with defaults which are not inputs (dropout, training flags) with their default values"""
+    for node in graph_def.node:
+        if node.op == "PlaceholderWithDefault" and node.name not in inputs:
+            node.op = "Identity"
+            node.attr["T"].CopyFrom(node.attr["dtype"])
+            del node.attr["dtype"]
+            del node.attr["shape"]
+    return graph_def
+
+
+def freeze(model: BertFloatClassifierModel, quantize: bool = False):
+    """Returns the frozen graph, names of its input nodes and the name of its output node"""
+    inputs = [model.input_ids_ph.op.name, model.input_masks_ph.op.name, model.token_types_ph.op.name]
+    output = (model.y_probas if model.return_probas else model.y_predictions).op.name
+    graph_def = tf.graph_util.convert_variables_to_constants(model.sess, model.sess.graph.as_graph_def(), [output])
+    graph_def = fix_defaults(graph_def, inputs)
+    # quantization goes after folding, otherwise dequantized weights are folded back to floats
+    transforms = TRANSFORMS + ["quantize_weights"] * quantize + ["sort_by_execution_order"]
+    return TransformGraph(graph_def, inputs, [output], transforms), inputs, output
+
+
+def main():
+    logging.basicConfig(format="%(asctime)s - %(name)s - %(levelname)s - %(message)s", level=logging.INFO)
+    parser = argparse.ArgumentParser(description="Freezes the emotion classification graph for CPU serving")
+    parser.add_argument("config", help="config of the checkpoint model, e.g. emo_bert.json")
+    parser.add_argument("--quantize", action="store_true", help="store weights as int8")
+    parser.add_argument("--output", help="path of the frozen graph, {MODEL_PATH}/frozen/emo_bert.pb by default")
+    parser.add_argument("--texts", default="warmup_texts.txt", help="texts to compare predictions on")
+    parser.add_argument("--tolerance", type=float, help="max absolute difference of probabilities")
+    args = parser.parse_args()
+
+    config = parse_config(find_config(args.config))
+    for component in config["chainer"]["pipe"]:
+        if component.get("class_name") == "emotion_classification":
+            # predictions of the checkpoint have to be computed by the model itself, not taken from the cache
+            component.update(cache_size=0, warmup_path=None)
+    output_path = expand_path(args.output or f"{config['metadata']['variables']['MODEL_PATH']}/frozen/emo_bert.pb")
+    tolerance = TOLERANCE[args.quantize] if args.tolerance is None else args.tolerance
+
+    chainer = build_model(config)
+    preprocessor, model = chainer[0], chainer[-1]
+    graph_def, inputs, output = freeze(model, args.quantize)
+    output_path.parent.mkdir(parents=True, exist_ok=True)
+    output_path.write_bytes(graph_def.SerializeToString())
+
+    metadata = {
+        "inputs": [f"{name}:0" for name in inputs],
+        "output": f"{output}:0",
+        "used_columns": model.used_columns,
+        "quantized": args.quantize,
+    }
+    output_path.with_suffix(".json").write_text(json.dumps(metadata, indent=2))
+
+    texts = [line.strip() for line in Path(args.texts).read_text().splitlines() if line.strip()]
+    features = preprocessor(texts)
+    frozen = FrozenBertFloatClassifierModel(output_path, bucket_size=model.bucket_size, cache_size=0)
+    expected, actual = model(features), frozen(features)
+    max_abs_diff = max(
+        float(np.max(np.abs(np.array(list(exp.values())) - np.array(list(act.values())))))
+        for exp, act in zip(expected, actual)
+    )
+    metadata.update(max_abs_diff=max_abs_diff, tolerance=tolerance)
+    output_path.with_suffix(".json").write_text(json.dumps(metadata, indent=2))
+    logger.info(
+        f"frozen graph is saved to {output_path} ({output_path.stat().st_size / 2 ** 20:.1f} MB), "
+        f"max abs diff on {len(texts)} texts: {max_abs_diff:.2e}"
+    )
+    if max_abs_diff > tolerance:
+        output_path.unlink()
+        raise RuntimeError(f"max abs diff {max_abs_diff:.2e} of the frozen graph exceeds tolerance {tolerance:.0e}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,111 @@
+import asyncio
+import threading
+import unittest
+
+from aiohttp import web
+
+from type_requester import TypeRequester
+
+ENTITIES = {
+    "Q1": {"claims": {"P31": [{"mainsnak": {"datavalue": {"value": {"id": "Q5"}}}}]}},
+    "Q2": {"claims": {"P31": [{"mainsnak": {"datavalue": {"value": {"id": "Q5"}}}}]}},
+    "Q3": {"claims": {}},
+    "Q5": {"labels": {"en": {"value": "human"}}},
+}
+
+
+class StubWikidata:
+    """Local wbgetentities stub, records requested ids"""
+
+    def __init__(self, port=8767):
+        self.port = port
+        self.requests = []
+        self._loop = asyncio.new_event_loop()
+        self._started = threading.Event()
+        threading.Thread(target=self._run, daemon=True).start()
+        self._started.wait()
+
+    async def handle(self, request):
+        ids = request.query["ids"].split("|")
+        self.requests.append(ids)
+        return web.json_response({"entities": {id: ENTITIES.get(id, {"id": id, "missing": ""}) for id in ids}})
+
+    def _run(self):
+        asyncio.set_event_loop(self._loop)
+        app = web.Application()
+        app.router.add_get("/w/api.php", self.handle)
+        self._runner = web.AppRunner(app)
+        self._loop.run_until_complete(self._runner.setup())
+        self._loop.run_until_complete(web.TCPSite(self._runner, "127.0.0.1", self.port).start())
+        self._started.set()
+        self._loop.run_forever()
+
+    @property
+    def url(self):
+        return f"http://127.0.0.1:{self.port}/w/api.php"
+
+
+class TestTypeRequester(unittest.TestCase):
+    @classmethod
+    def setUpClass(cls):
+        cls.stub = StubWikidata()
+
+    def setUp(self):
+        self.stub.requests.clear()
+
+    def test_bulk_request_and_cache(self):
+        requester = TypeRequester(wikidata_url=self.stub.url)
+        result = requester([[["Q1", "Q2"], ["Q2", "Q3", "Q404"]]])
+        self.assertEqual(result, [[["human", "human"], ["human", None, None]]])
+        # one call for entities with deduplicated ids, one for the labels of types
+        self.assertEqual(self.stub.requests, [["Q1", "Q2", "Q3", "Q404"], ["Q5"]])
+
+        self.stub.requests.clear()
+        self.assertEqual(requester([[["Q2", "Q3"]]]), [[["human", None]]])
+        self.assertEqual(self.stub.requests, [])
+        requester.destroy()
+
+    def test_persistent_store(self):
+        import tempfile
+
+        with tempfile.TemporaryDirectory() as tmp_dir:
+            path = f"{tmp_dir}/types.sqlite"
+            requester = TypeRequester(cache_path=path, wikidata_url=self.stub.url)
+            requester([[["Q1"]]])
+            requester.destroy()
+            self.stub.requests.clear()
+            requester = TypeRequester(cache_path=path, lru_size=1, wikidata_url=self.stub.url)
+            self.assertEqual(requester([[["Q1"]]]), [[["human"]]])
+            self.assertEqual(self.stub.requests, [])
+            requester.destroy()
+
+    def test_chunks_and_concurrency(self):
+        requester = TypeRequester(wikidata_url=self.stub.url, max_concurrency=2)
+        ids = [f"Q{i}" for i in range(100, 220)]
+        self.assertEqual(requester([[ids]]), [[[None] * len(ids)]])
+        self.assertEqual(sorted(len(request) for request in self.stub.requests), [20, 50, 50])
+        requester.destroy()
+
+
+class TestTypeIndex(unittest.TestCase):
+    def test_offline_index(self):
+        import json
+        import tempfile
+
+        from type_index import read_json_dump, save_index
+
+        with tempfile.TemporaryDirectory() as tmp_dir:
+            dump_path = f"{tmp_dir}/dump.json"
+            with open(dump_path, "w") as fout:
+                fout.write("[\n")
+                fout.write(",\n".join(json.dumps({"id": id, **entity}) for id, entity in ENTITIES.items()))
+                fout.write("\n]\n")
+            save_index(f"{tmp_dir}/index", *read_json_dump(dump_path))
+
+            requester = TypeRequester(index_path=f"{tmp_dir}/index", wikidata_url="http://127.0.0.1:1/none")
+            self.assertEqual(requester([[["Q1", "Q2"], ["Q3", "Q404"]]]), [[["human", "human"], [None, None]]])
+            self.assertEqual(requester.index.get("Q1"), ("Q5", "human"))
+
+
+if __name__ == "__main__":
+    unittest.main()
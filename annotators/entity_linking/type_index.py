@@ -0,0 +1,178 @@
+"""
+Offline Q-id -> `instance of` (P31) index of Wikidata entities.
+
+The index is a directory of NumPy arrays which are memory-mapped on load:
+    ids.npy            sorted numeric ids of entities (Q42 -> 42)
+    types.npy          position of the entity type in the type table, aligned with ids.npy
+    type_ids.npy       numeric ids of types
+    label_offsets.npy  offsets of type labels in labels.bin, len(type_ids) + 1 values
+    labels.bin         utf-8 labels of types one after another
+
+Build it from a Wikidata JSON dump (`latest-all.json.gz` or `.bz2`, one entity per line):
+    python type_index.py json latest-all.json.gz ~/.deeppavlov/downloads/wikidata_eng/type_index
+or from the HDT dump used by DeepPavlov KBQA models:
+    python type_index.py hdt wikidata.hdt ~/.deeppavlov/downloads/wikidata_eng/type_index
+Labels of types may be taken from `wiki_eng_q_to_name.pickle` of the wikidata_eng download with `--names`.
+"""
+import argparse
+import bz2
+import gzip
+import json
+import logging
+import pickle
+from array import array
+from logging import getLogger
+from pathlib import Path
+from typing import Dict, Iterator, Optional, Sequence, Tuple
+
+import numpy as np
+
+log = getLogger(__name__)
+
+P31_URI = "http://www.wikidata.org/prop/direct/P31"
+LABEL_URI = "http://www.w3.org/2000/01/rdf-schema#label"
+ENTITY_PREFIX = "http://www.wikidata.org/entity/"
+
+
+def q2int(id: str) -> int:
+    return int(id.rsplit("/", 1)[-1][1:])
+
+
+class TypeIndex:
+    def __init__(self, path):
+        path = Path(path).expanduser()
+        self.ids = np.load(path / "ids.npy", mmap_mode="r")
+        self.types = np.load(path / "types.npy", mmap_mode="r")
+        self.type_ids = np.load(path / "type_ids.npy", mmap_mode="r")
+        self.label_offsets = np.load(path / "label_offsets.npy", mmap_mode="r")
+        self.labels = np.memmap(path / "labels.bin", dtype=np.uint8, mode="r") if self.label_offsets[-1] else b""
+
+    def get(self, id: str) -> Optional[Tuple[str, Optional[str]]]:
+        """Returns (type id, type label) of an entity, None if it is not in the index"""
+        if not id or id[0] != "Q" or not id[1:].isdigit():
+            return None
+        num = int(id[1:])
+        pos = np.searchsorted(self.ids, num)
+        if pos == len(self.ids) or self.ids[pos] != num:
+            return None
+        type_pos = self.types[pos]
+        start, end = self.label_offsets[type_pos], self.label_offsets[type_pos + 1]
+        label = bytes(self.labels[start:end]).decode("utf-8") if end > start else None
+        return f"Q{self.type_ids[type_pos]}", label
+
+
+def save_index(path, entity_ids: Sequence[int], entity_types: Sequence[int], labels: Dict[int, str]):
+    """Saves the index of numeric entity ids and ids of their types, only the first type of an entity is kept"""
+    path = Path(path).expanduser()
+    path.mkdir(parents=True, exist_ok=True)
+    pairs = np.stack([np.asarray(entity_ids, dtype=np.int64), np.asarray(entity_types, dtype=np.int64)], axis=1)
+    # stable sort keeps the first type of entities with several P31 claims first
+    pairs = pairs[np.argsort(pairs[:, 0], kind="stable")]
+    first = np.ones(len(pairs), dtype=bool)
+    first[1:] = pairs[1:, 0] != pairs[:-1, 0]
+    pairs = pairs[first]
+
+    type_ids, types = np.unique(pairs[:, 1], return_inverse=True)
+    encoded = [labels.get(int(type_id), "").encode("utf-8") for type_id in type_ids]
+    label_offsets = np.zeros(len(type_ids) + 1, dtype=np.int64)
+    label_offsets[1:] = np.cumsum([len(label) for label in encoded])
+
+    np.save(path / "ids.npy", pairs[:, 0])
+    np.save(path / "types.npy", types.astype(np.int32))
+    np.save(path / "type_ids.npy", type_ids)
+    np.save(path / "label_offsets.npy", label_offsets)
+    (path / "labels.bin").write_bytes(b"".join(encoded))
+    log.info(f"type index of {len(pairs)} entities and {len(type_ids)} types is saved to {path}")
+
+
+def _open(path):
+    path = str(path)
+    if path.endswith(".gz"):
+        return gzip.open(path, "rt", encoding="utf-8")
+    if path.endswith(".bz2"):
+        return bz2.open(path, "rt", encoding="utf-8")
+    return open(path, encoding="utf-8")
+
+
+def iter_json_dump(path) -> Iterator[Dict]:
+    with _open(path) as fin:
+        for line in fin:
+            line = line.strip().rstrip(",")
+            if line in ("[", "]", ""):
+                continue
+            yield json.loads(line)
+
+
+def read_json_dump(path, names: Optional[Dict[int, str]] = None):
+    # ids are kept in compact arrays, there are ~100M entities in the full dump
+    entity_ids, entity_types = array("q"), array("q")
+    for entity in iter_json_dump(path):
+        try:
+            type_id = entity["claims"]["P31"][0]["mainsnak"]["datavalue"]["value"]["id"]
+        except (KeyError, IndexError, TypeError):
+            continue
+        entity_ids.append(q2int(entity["id"]))
+        entity_types.append(q2int(type_id))
+
+    if names is None:
+        # the second pass collects labels of types only, labels of all entities don't fit in memory
+        type_ids = set(entity_types)
+        names = {}
+        for entity in iter_json_dump(path):
+            num = q2int(entity["id"]) if entity.get("id", "").startswith("Q") else None
+            if num in type_ids and "en" in entity.get("labels", {}):
+                names[num] = entity["labels"]["en"]["value"]
+    return entity_ids, entity_types, names
+
+
+def read_hdt(path, names: Optional[Dict[int, str]] = None):
+    from hdt import HDTDocument
+
+    document = HDTDocument(str(path))
+    triples, _ = document.search_triples("", P31_URI, "")
+    entity_ids, entity_types = array("q"), array("q")
+    for subj, _, obj in triples:
+        if subj.startswith(ENTITY_PREFIX + "Q") and obj.startswith(ENTITY_PREFIX + "Q"):
+            entity_ids.append(q2int(subj))
+            entity_types.append(q2int(obj))
+
+    if names is None:
+        names = {}
+        for type_id in set(entity_types):
+            labels, _ = document.search_triples(f"{ENTITY_PREFIX}Q{type_id}", LABEL_URI, "")
+            for _, _, label in labels:
+                if label.endswith("@en"):
+                    names[type_id] = label[: -len("@en")].strip('"')
+                    break
+    return entity_ids, entity_types, names
+
+
+def load_names(path) -> Dict[int, str]:
+    with open(Path(path).expanduser(), "rb") as fin:
+        q_to_name = pickle.load(fin)
+    names = {}
+    for id, name in q_to_name.items():
+        if isinstance(name, (list, tuple)):
+            name = name[0] if name else None
+        if name and id.startswith("Q"):
+            names[q2int(id)] = name
+    return names
+
+
+def main():
+    logging.basicConfig(format="%(asctime)s - %(name)s - %(levelname)s - %(message)s", level=logging.INFO)
+    parser = argparse.ArgumentParser(description="Builds offline Q-id -> instance of index for type_requester")
+    parser.add_argument("source", choices=["json", "hdt"], help="format of the Wikidata dump")
+    parser.add_argument("dump_path", help="path to the Wikidata dump")
+    parser.add_argument("index_path", help="directory to save the index to")
+    parser.add_argument("--names", help="pickle with Q-id -> name dict, e.g. wikidata_eng/wiki_eng_q_to_name.pickle")
+    args = parser.parse_args()
+
+    names = load_names(args.names) if args.names else None
+    read = read_json_dump if args.source == "json" else read_hdt
+    entity_ids, entity_types, names = read(args.dump_path, names)
+    save_index(args.index_path, entity_ids, entity_types, names)
+
+
+if __name__ == "__main__":
+    main()
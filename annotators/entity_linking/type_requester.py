@@ -1,54 +1,200 @@
 import asyncio
-from typing import List, Optional
+import sqlite3
+import threading
+from collections import OrderedDict
+from pathlib import Path
+from typing import Dict, Iterable, List, Optional, Tuple
 from logging import getLogger
 
 import aiohttp
 
+from deeppavlov.core.commands.utils import expand_path
 from deeppavlov.core.common.registry import register
 from deeppavlov.core.models.component import Component
 
+from type_index import TypeIndex
+
 REQUEST_TIMEOUT = 5
+WIKIDATA_URL = "https://www.wikidata.org/w/api.php"
+MAX_IDS_PER_REQUEST = 50  # limit of wbgetentities for anonymous users
 
 log = getLogger(__name__)
-loop = asyncio.get_event_loop()
+
+
+class TypeStore:
+    """Persistent Q-id -> (type id, type label) store in SQLite with an in-memory LRU in front of it."""
+
+    def __init__(self, path: Optional[str] = None, lru_size: int = 100000):
+        self.lru_size = lru_size
+        self._lru = OrderedDict()
+        self._lock = threading.Lock()
+        path = ":memory:" if path is None else str(expand_path(path))
+        if path != ":memory:":
+            Path(path).parent.mkdir(parents=True, exist_ok=True)
+        self._conn = sqlite3.connect(path, check_same_thread=False)
+        self._conn.execute("CREATE TABLE IF NOT EXISTS types (id TEXT PRIMARY KEY, type_id TEXT, type_label TEXT)")
+        self._conn.commit()
+
+    def _remember(self, id: str, value: Tuple[Optional[str], Optional[str]]):
+        self._lru[id] = value
+        self._lru.move_to_end(id)
+        while len(self._lru) > self.lru_size:
+            self._lru.popitem(last=False)
+
+    def get_many(self, ids: Iterable[str]) -> Dict[str, Tuple[Optional[str], Optional[str]]]:
+        found = {}
+        with self._lock:
+            to_select = []
+            for id in ids:
+                if id in self._lru:
+                    self._lru.move_to_end(id)
+                    found[id] = self._lru[id]
+                else:
+                    to_select.append(id)
+            for start in range(0, len(to_select), 500):
+                chunk = to_select[start : start + 500]
+                rows = self._conn.execute(
+                    f"SELECT id, type_id, type_label FROM types WHERE id IN ({','.join('?' * len(chunk))})", chunk
+                ).fetchall()
+                for id, type_id, type_label in rows:
+                    found[id] = (type_id, type_label)
+                    self._remember(id, (type_id, type_label))
+        return found
+
+    def put_many(self, items: Dict[str, Tuple[Optional[str], Optional[str]]]):
+        with self._lock:
+            self._conn.executemany(
+                "INSERT OR REPLACE INTO types VALUES (?, ?, ?)", [(id, *value) for id, value in items.items()]
+            )
+            self._conn.commit()
+            for id, value in items.items():
+                self._remember(id, value)
+
+    def destroy(self):
+        self._conn.close()
 
 
 @register("type_requester")
 class TypeRequester(Component):
-    def __init__(self, *args, **kwargs):
-        pass
+    """
+    Finds labels of `instance of` (P31) types of Wikidata entities.
+
+    Types are looked up in the local store first, ids missing there are deduplicated within a batch and requested
+    with multi-id `wbgetentities` calls, one for the claims of entities and one for the labels of their types.
+    If `index_path` is set, types are taken from the offline index built by `type_index.py` only,
+    without any requests to Wikidata.
 
-    async def request_wikidata(self, session, id: str, type_id: bool = False) -> Optional[str]:
-        ans = None
+    Requests are run in the event loop of a background thread owned by the component with one long-lived
+    connection-pooled session, call `destroy` to close them.
+
+    Args:
+        cache_path: path to the SQLite file of the store, the store is kept in memory if not set
+        lru_size: number of ids kept in memory in front of the store
+        wikidata_url: Wikidata API endpoint
+        index_path: path to the directory of the offline type index
+        pool_size: max number of connections of the session
+        max_concurrency: max number of simultaneous requests to Wikidata
+    """
+
+    def __init__(
+        self,
+        cache_path: Optional[str] = None,
+        lru_size: int = 100000,
+        wikidata_url: str = WIKIDATA_URL,
+        index_path: Optional[str] = None,
+        pool_size: int = 100,
+        max_concurrency: int = 10,
+        *args,
+        **kwargs,
+    ):
+        self.index = TypeIndex(expand_path(index_path)) if index_path else None
+        self.store = TypeStore(cache_path, lru_size)
+        self.wikidata_url = wikidata_url
+        self._loop = None
+        if self.index is None:
+            self._loop = asyncio.new_event_loop()
+            self._thread = threading.Thread(target=self._loop.run_forever, name="type_requester_loop", daemon=True)
+            self._thread.start()
+            self._session, self._semaphore = self._run(self._create_session(pool_size, max_concurrency))
+
+    def _run(self, coro):
+        return asyncio.run_coroutine_threadsafe(coro, self._loop).result()
+
+    @staticmethod
+    async def _create_session(pool_size: int, max_concurrency: int):
+        # session and semaphore are bound to the loop they are created in
+        connector = aiohttp.TCPConnector(limit=pool_size)
+        return aiohttp.ClientSession(connector=connector), asyncio.Semaphore(max_concurrency)
+
+    async def request_chunk(self, ids: List[str], props: str) -> Dict:
+        params = {"action": "wbgetentities", "format": "json", "ids": "|".join(ids), "props": props, "languages": "en"}
         try:
-            async with session.get(
-                f"https://www.wikidata.org/w/api.php?action=wbgetentities&format=json&ids={id}", timeout=REQUEST_TIMEOUT
-            ) as resp:
-                if resp.status == 200:
-                    json = await resp.json()
-                    if type_id:
-                        ans = json["entities"][id]["labels"]["en"]["value"]
-                    else:
-                        ans = json["entities"][id]["claims"]["P31"][0]["mainsnak"]["datavalue"]["value"]["id"]
+            async with self._semaphore:
+                async with self._session.get(self.wikidata_url, params=params, timeout=REQUEST_TIMEOUT) as resp:
+                    if resp.status == 200:
+                        json = await resp.json()
+                        return json.get("entities", {})
         except asyncio.TimeoutError:
-            log.warning(f"TimeoutError for {id}")
+            log.warning(f"TimeoutError for {params['ids']}")
         except Exception as e:
             log.error(repr(e))
-        finally:
-            return ans
+        return {}
+
+    async def request_entities(self, ids: List[str], props: str) -> Dict:
+        chunks = [ids[start : start + MAX_IDS_PER_REQUEST] for start in range(0, len(ids), MAX_IDS_PER_REQUEST)]
+        entities = {}
+        for chunk_entities in await asyncio.gather(*[self.request_chunk(chunk, props) for chunk in chunks]):
+            entities.update(chunk_entities)
+        return entities
 
-    async def process_id(self, session, id):
-        type_id = await self.request_wikidata(session, id)
-        return await self.request_wikidata(session, type_id, True)
+    async def resolve(self, ids: List[str]) -> Dict[str, Tuple[Optional[str], Optional[str]]]:
+        entities = await self.request_entities(ids, "claims")
+        type_ids = {}
+        for id in ids:
+            try:
+                type_ids[id] = entities[id]["claims"]["P31"][0]["mainsnak"]["datavalue"]["value"]["id"]
+            except (KeyError, IndexError, TypeError):
+                # entity has no type or is missing in Wikidata: store it as such not to request it again
+                if id in entities:
+                    type_ids[id] = None
 
-    async def process_group(self, session, entity_ids):
-        results = await asyncio.gather(*[self.process_id(session, id) for id in entity_ids])
-        return results
+        labels = {}
+        unique_type_ids = sorted({type_id for type_id in type_ids.values() if type_id})
+        if unique_type_ids:
+            type_entities = await self.request_entities(unique_type_ids, "labels")
+            for type_id in unique_type_ids:
+                try:
+                    labels[type_id] = type_entities[type_id]["labels"]["en"]["value"]
+                except (KeyError, TypeError):
+                    pass
 
-    async def async_call(self, x: List[List[List[str]]]) -> List[List[List[Optional[str]]]]:
-        async with aiohttp.ClientSession(loop=loop) as session:
-            results = await asyncio.gather(*[self.process_group(session, entity_ids) for entity_ids in x[0]])
-            return [results]
+        # ids which failed to resolve because of network errors are not saved
+        return {
+            id: (type_id, labels.get(type_id))
+            for id, type_id in type_ids.items()
+            if type_id is None or type_id in labels
+        }
+
+    def get_types(self, ids: Iterable[str]) -> Dict[str, Tuple[Optional[str], Optional[str]]]:
+        ids = list(dict.fromkeys(ids))
+        if self.index is not None:
+            return {id: self.index.get(id) or (None, None) for id in ids}
+        types = self.store.get_many(ids)
+        misses = [id for id in ids if id not in types]
+        if misses:
+            resolved = self._run(self.resolve(misses))
+            self.store.put_many(resolved)
+            types.update(resolved)
+        return types
 
     def __call__(self, x: List[List[List[str]]]) -> List[List[List[Optional[str]]]]:
-        return loop.run_until_complete(self.async_call(x))
+        types = self.get_types(id for entity_ids in x for group in entity_ids for id in group)
+        return [[[types.get(id, (None, None))[1] for id in group] for group in entity_ids] for entity_ids in x]
+
+    def destroy(self):
+        if self._loop is not None and self._loop.is_running():
+            self._run(self._session.close())
+            self._loop.call_soon_threadsafe(self._loop.stop)
+            self._thread.join()
+            self._loop.close()
+        super().destroy()
@@ -1,6 +1,8 @@
 import pickle
 import re
 
+import numpy as np
+
 
 def load_dictionaries(pickle_file):
     dicts = pickle.load(open(pickle_file, mode="rb"))
@@ -76,3 +78,33 @@ def get_chunks(seq, tags):
         chunks.append(chunk)
 
     return chunks
+
+
+def viterbi_decode_batch(logits, lengths, transition_params):
+    """
+    Vectorized version of tf.contrib.crf.viterbi_decode for a padded batch.
+    Args:
+            logits: [batch_size, max_len, num_tags] unary potentials
+            lengths: [batch_size] real lengths of sequences
+            transition_params: [num_tags, num_tags] transition potentials
+    Returns:
+            list of label sequences, each cut to the real length
+    """
+    logits = np.asarray(logits)
+    lengths = np.asarray(lengths)
+    batch_size, max_len, num_tags = logits.shape
+    score = logits[:, 0]
+    # padded time steps keep the previous tag, so backtracking passes them through unchanged
+    backpointers = np.tile(np.arange(num_tags), (batch_size, max_len, 1))
+    for t in range(1, max_len):
+        v = score[:, :, None] + transition_params[None]
+        mask = (t < lengths)[:, None]
+        backpointers[:, t] = np.where(mask, np.argmax(v, axis=1), backpointers[:, t])
+        score = np.where(mask, np.max(v, axis=1) + logits[:, t], score)
+
+    tags = np.empty((batch_size, max_len), dtype=np.int64)
+    tags[:, -1] = np.argmax(score, axis=1)
+    batch_idx = np.arange(batch_size)
+    for t in range(max_len - 1, 0, -1):
+        tags[:, t - 1] = backpointers[batch_idx, t, tags[:, t]]
+    return [seq[:length].tolist() for seq, length in zip(tags, lengths)]
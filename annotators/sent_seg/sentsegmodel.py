@@ -163,11 +163,11 @@ class model:
         indexed_data["indexed_char"] = indexed_char
         return indexed_data
 
-    def get_batch(self, data, start_idx):
+    def get_batch(self, data, start_idx, batch_size=None):
         # input: data{indexed_word, indexed_char, indexed_tag, indexed_pos, indexed_chunk}
         # output: a batch of data after padding
         nb_sentences = len(data["indexed_word"])
-        end_idx = start_idx + self.params.batch_size
+        end_idx = start_idx + (batch_size or self.params.batch_size)
         if end_idx > nb_sentences:
             end_idx = nb_sentences
         batch_word = data["indexed_word"][start_idx:end_idx]
@@ -177,75 +177,69 @@ class model:
         batch_raw_word = data["raw_word"][start_idx:end_idx]
         real_sentence_lengths = [len(sent) for sent in batch_word]
         max_len_sentences = max(real_sentence_lengths)
+        nb_batch = len(batch_word)
 
-        padded_word = [
-            np.lib.pad(
-                sent,
-                (0, max_len_sentences - len(sent)),
-                "constant",
-                constant_values=(self.word2id["<PAD>"], self.word2id["<PAD>"]),
-            )
-            for sent in batch_word
-        ]
+        # padded arrays are allocated once and filled row by row
+        padded_word = np.full((nb_batch, max_len_sentences), self.word2id["<PAD>"], dtype=np.int32)
+        padded_raw_word = np.full((nb_batch, max_len_sentences), "", dtype=object)
+        for i, (sent, raw_sent) in enumerate(zip(batch_word, batch_raw_word)):
+            padded_word[i, : len(sent)] = sent
+            padded_raw_word[i, : len(raw_sent)] = raw_sent
 
         batch = {
             "batch_word": batch_word,
             "padded_word": padded_word,
             "real_sentence_lengths": real_sentence_lengths,
-            "padded_raw_word": [sent + [""] * (max_len_sentences - len(sent)) for sent in batch_raw_word],
+            "padded_raw_word": padded_raw_word,
         }
 
         if "indexed_tag" in data:
-            padded_tag = [
-                np.lib.pad(
-                    sent,
-                    (0, max_len_sentences - len(sent)),
-                    "constant",
-                    constant_values=(self.tag2id["<PAD>"], self.tag2id["<PAD>"]),
-                )
-                for sent in batch_tag
-            ]
+            padded_tag = np.full((nb_batch, max_len_sentences), self.tag2id["<PAD>"], dtype=np.int32)
+            for i, sent in enumerate(batch_tag):
+                padded_tag[i, : len(sent)] = sent
             batch["padded_tag"] = padded_tag
             batch["batch_tag"] = batch_tag
 
         # pad chars
-        max_len_of_sentence = max([len(sentence) for sentence in batch_char])
         max_len_of_word = max([max([len(word) for word in sentence]) for sentence in batch_char])
 
-        padding_word = np.full(max_len_of_word, self.char2id["<PAD>"])
-        padded_char = []
-
-        lengths_of_word = []
-
-        for sentence in batch_char:
-            padded_sentence = []
-            length_of_word_in_sentence = []
-
-            for word in sentence:
-                length_of_word_in_sentence.append(len(word))
-                padded_sentence.append(
-                    np.lib.pad(
-                        word,
-                        (0, max_len_of_word - len(word)),
-                        "constant",
-                        constant_values=(self.char2id["<PAD>"], self.char2id["<PAD>"]),
-                    )
-                )
-
-            for i in range(max_len_of_sentence - len(padded_sentence)):
-                padded_sentence.append(padding_word)
-                length_of_word_in_sentence.append(0)
+        padded_char = np.full((nb_batch, max_len_sentences, max_len_of_word), self.char2id["<PAD>"], dtype=np.int32)
+        lengths_of_word = np.zeros((nb_batch, max_len_sentences), dtype=np.int32)
 
-            padded_char.append(padded_sentence)
-            lengths_of_word.append(length_of_word_in_sentence)
-
-        lengths_of_word = np.array(lengths_of_word)
+        for i, sentence in enumerate(batch_char):
+            for j, word in enumerate(sentence):
+                padded_char[i, j, : len(word)] = word
+                lengths_of_word[i, j] = len(word)
 
         batch["padded_char"] = padded_char
         batch["lengths_of_word"] = lengths_of_word
 
         return batch, end_idx
 
+    def get_bucketed_batches(self, data):
+        # input: data{indexed_word, indexed_char, raw_word}
+        # output: list of (sentence indexes, batch), sentences of close length are padded together
+        lengths = [len(sent) for sent in data["indexed_word"]]
+        order = sorted(range(len(lengths)), key=lengths.__getitem__)
+
+        buckets = []
+        for idx in order:
+            if (
+                buckets
+                and len(buckets[-1]) < self.params.batch_size
+                and lengths[idx] - lengths[buckets[-1][0]] <= self.params.bucket_width
+            ):
+                buckets[-1].append(idx)
+            else:
+                buckets.append([idx])
+
+        batches = []
+        for bucket in buckets:
+            bucket_data = {key: [value[i] for i in bucket] for key, value in data.items()}
+            batch, _ = self.get_batch(bucket_data, 0, batch_size=len(bucket))
+            batches.append((bucket, batch))
+        return batches
+
     def train(self, training_file_path, val_file_path, output_model_path=None, nb_epochs=20, init_model_path=None):
         raw_train_data = self.read_raw_data(raw_file_path=training_file_path, min_length_of_sentence=2)
         raw_val_data = self.read_raw_data(raw_file_path=val_file_path, min_length_of_sentence=2)
@@ -409,27 +403,21 @@ class model:
                 print(line)
 
     def predict(self, sess, text):
-        inp_sent = text
-
-        if inp_sent == "":
-            return ""
-
-        for p in [".", "?", "!"]:
-            if p in inp_sent:
-                return inp_sent
-
-        words = word_tokenize(inp_sent)
-
-        raw_data = {"word": [words]}
-
+        return self.predict_batch(sess, [text])[0]
+
+    def predict_batch(self, sess, texts):
+        results = list(texts)
+        # texts which are empty or already punctuated are returned as is
+        to_predict = [i for i, text in enumerate(texts) if text and not any(p in text for p in [".", "?", "!"])]
+        words = {i: word_tokenize(texts[i]) for i in to_predict}
+        to_predict = [i for i in to_predict if words[i]]
+        if not to_predict:
+            return results
+
+        raw_data = {"word": [words[i] for i in to_predict]}
         indexed_data = self.index_data(raw_data)
-
-        current_idx = 0
-        while current_idx < len(indexed_data["indexed_word"]):
-            batch, current_idx = self.get_batch(indexed_data, current_idx)
-
-            # decode using Viterbi algorithm
-            viterbi_sequences = []
+        viterbi_sequences = [None] * len(to_predict)
+        for bucket, batch in self.get_bucketed_batches(indexed_data):
             feed_dict = {
                 self.tf_word_ids: batch["padded_word"],
                 self.tf_sentence_lengths: batch["real_sentence_lengths"],
@@ -440,27 +428,28 @@ class model:
             }
             _logits, _transition_params = sess.run([self.logits, self.transition_params], feed_dict=feed_dict)
 
-            # iterate over the sentences
-            for _logit, sequence_length in zip(_logits, batch["real_sentence_lengths"]):
-                # keep only the valid time steps
-                _logit = _logit[:sequence_length]
-                viterbi_sequence, viterbi_score = tf.contrib.crf.viterbi_decode(_logit, _transition_params)
-                viterbi_sequences += [viterbi_sequence]
+            # decode using Viterbi algorithm for the whole bucket at once
+            bucket_sequences = helper.viterbi_decode_batch(_logits, batch["real_sentence_lengths"], _transition_params)
+            for idx, viterbi_sequence in zip(bucket, bucket_sequences):
+                viterbi_sequences[idx] = viterbi_sequence
 
-            # pred_labels = [[self.id2tag[t] for t in s] for s in viterbi_sequences]
-            pred_labels = [self.id2tag[t] for t in viterbi_sequences[0]]
-            # print("Pred_labels: ",pred_labels)
+        for i, viterbi_sequence in zip(to_predict, viterbi_sequences):
+            pred_labels = [self.id2tag[t] for t in viterbi_sequence]
+            results[i] = self.restore_punctuation(words[i], pred_labels)
+        return results
 
-            tag2text = {"B-S": ".", "B-Q": "?", "O": "."}
+    @staticmethod
+    def restore_punctuation(words, pred_labels):
+        tag2text = {"B-S": ".", "B-Q": "?", "O": "."}
 
-            punctuation = tag2text[pred_labels[0]]
-            sent = words[0]
+        punctuation = tag2text[pred_labels[0]]
+        sent = words[0]
 
-            for word, tag in zip(words[1:], pred_labels[1:]):
-                if tag != "O":
-                    sent += punctuation
-                    punctuation = tag2text[tag]
-                sent += " " + word
-            sent += punctuation
+        for word, tag in zip(words[1:], pred_labels[1:]):
+            if tag != "O":
+                sent += punctuation
+                punctuation = tag2text[tag]
+            sent += " " + word
+        sent += punctuation
 
-            return sent
+        return sent
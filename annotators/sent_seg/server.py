@@ -41,10 +41,13 @@ def respond():
 
     sentseg_result = []
 
-    for i, text in enumerate(user_sentences):
+    texts = [text for text in user_sentences if text.strip()]
+    logger.info(f"user texts: {texts}, session_id: {session_id}")
+    punct_sents = iter(model.predict_batch(sess, texts))
+
+    for text in user_sentences:
         if text.strip():
-            logger.info(f"user text: {text}, session_id: {session_id}")
-            sentseg = model.predict(sess, text)
+            sentseg = next(punct_sents)
             sentseg = sentseg.replace(" '", "'")
             sentseg = preprocessing(sentseg)
             segments = split_segments(sentseg)
@@ -0,0 +1,45 @@
+import argparse
+import random
+import time
+
+from normalizer import preprocess, preprocess_sequential, templates
+
+
+def make_corpus(n_sentences, seed=42):
+    rng = random.Random(seed)
+    vocab = ["the", "harvester", "is", "broken", "what", "status", "of", "my", "combine", "please", "hello", "tell"]
+    for templ, new_str in templates[:-1]:
+        word = templ.pattern.replace(r"\b", "")
+        vocab += [word.replace("'?", "'"), word.replace("'?", ""), new_str]
+    vocab += [w.upper() for w in vocab[:40]]
+    seps = [" ", " ", " ", "  ", "\t", ", ", ". ", "'"]
+    corpus = []
+    for _ in range(n_sentences):
+        corpus.append("".join(rng.choice(vocab) + rng.choice(seps) for _ in range(rng.randint(1, 20))))
+    return corpus
+
+
+def bench(func, corpus):
+    st_time = time.time()
+    result = [func(text) for text in corpus]
+    return result, time.time() - st_time
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Compare sequential and compiled spelling preprocessing templates")
+    parser.add_argument("-n", "--n-sentences", type=int, default=100000)
+    args = parser.parse_args()
+
+    corpus = make_corpus(args.n_sentences)
+    old_result, old_time = bench(preprocess_sequential, corpus)
+    new_result, new_time = bench(preprocess, corpus)
+
+    mismatches = [(text, old, new) for text, old, new in zip(corpus, old_result, new_result) if old != new]
+    for text, old, new in mismatches[:10]:
+        print(f"MISMATCH {text!r}: {old!r} != {new!r}")
+    print(f"sentences: {len(corpus)}, mismatches: {len(mismatches)}")
+    print(f"sequential: {old_time:.3f}s, compiled: {new_time:.3f}s, speedup: {old_time / new_time:.1f}x")
+
+
+if __name__ == "__main__":
+    main()
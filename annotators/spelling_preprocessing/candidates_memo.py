@@ -0,0 +1,51 @@
+from deeppavlov.models.spelling_correction.brillmoore.error_model import ErrorModel
+
+from cache import LRUCache
+
+
+class CandidatesMemo:
+    """
+    Token level front of the Brill-Moore error model.
+
+    Tokens present in the error model dictionary skip the candidates search and are kept as is,
+    candidates of out-of-vocabulary tokens are searched once per request and memoized across requests.
+    """
+
+    def __init__(self, error_model: ErrorModel, maxsize=100000):
+        self.vocab_hits = 0
+        self.cache = LRUCache(maxsize=maxsize)
+        self._dictionary = error_model.dictionary
+        self._infer_instance = error_model._infer_instance
+        error_model._infer_instance = self
+
+    def in_vocab(self, token):
+        return self._dictionary._normalize(token) in self._dictionary.words_set
+
+    def __call__(self, instance):
+        candidates = {}
+        for token in instance:
+            if token in candidates:
+                continue
+            if self.in_vocab(token):
+                self.vocab_hits += 1
+                candidates[token] = [(0, token)]
+            else:
+                candidates[token] = self.cache.get(token)
+
+        misses = [token for token, cands in candidates.items() if cands is None]
+        if misses:
+            for token, cands in zip(misses, self._infer_instance(misses)):
+                self.cache.put(token, cands)
+                candidates[token] = cands
+        return [candidates[token] for token in instance]
+
+    def stats(self):
+        return {"vocab_hits": self.vocab_hits, **self.cache.stats()}
+
+
+def memoize_candidates(model, maxsize=100000):
+    """Finds the error model in the pipe of a spelling correction chainer and wraps its candidates search."""
+    for *_, component in model.pipe:
+        if isinstance(component, ErrorModel):
+            return CandidatesMemo(component, maxsize=maxsize)
+    raise ValueError("Spelling correction model has no ErrorModel in its pipe")
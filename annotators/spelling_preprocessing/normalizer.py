@@ -0,0 +1,176 @@
+import re
+from functools import partial
+
+templates = []
+templates += [(re.compile(r"\bwon'?t\b", flags=re.IGNORECASE), "will not")]
+templates += [(re.compile(r"\bhaven'?t\b", flags=re.IGNORECASE), "have not")]
+templates += [(re.compile(r"\bhadn'?t\b", flags=re.IGNORECASE), "had not")]
+templates += [(re.compile(r"\bdoesn'?t\b", flags=re.IGNORECASE), "does not")]
+templates += [(re.compile(r"\bdon'?t\b", flags=re.IGNORECASE), "do not")]
+templates += [(re.compile(r"\bdidn'?t\b", flags=re.IGNORECASE), "did not")]
+templates += [(re.compile(r"\bcan'?t\b", flags=re.IGNORECASE), "can not")]
+templates += [(re.compile(r"\bi'?m\b", flags=re.IGNORECASE), "i am")]
+templates += [(re.compile(r"\bisn'?t\b", flags=re.IGNORECASE), "is not")]
+templates += [(re.compile(r"\baren'?t\b", flags=re.IGNORECASE), "are not")]
+templates += [(re.compile(r"\bi'd\b", flags=re.IGNORECASE), "i would")]
+
+templates += [(re.compile(r"\bu\b", flags=re.IGNORECASE), "you")]
+templates += [(re.compile(r"\br\b", flags=re.IGNORECASE), "are")]
+templates += [(re.compile(r"\bya\b", flags=re.IGNORECASE), "you")]
+templates += [(re.compile(r"\bem\b", flags=re.IGNORECASE), "them")]
+templates += [(re.compile(r"\bda\b", flags=re.IGNORECASE), "the")]
+templates += [(re.compile(r"\bain't\b", flags=re.IGNORECASE), "is not")]
+templates += [(re.compile(r"\bur\b", flags=re.IGNORECASE), "your")]
+templates += [(re.compile(r"\bru\b", flags=re.IGNORECASE), "are you")]
+templates += [(re.compile(r"\burs\b", flags=re.IGNORECASE), "yours")]
+templates += [(re.compile(r"\byou'?re\b", flags=re.IGNORECASE), "you are")]
+
+templates += [(re.compile(r"\byall\b", flags=re.IGNORECASE), "you all")]
+templates += [(re.compile(r"\by'all\b", flags=re.IGNORECASE), "you all")]
+templates += [(re.compile(r"\bshes\b", flags=re.IGNORECASE), "she is")]
+templates += [(re.compile(r"\bhes\b", flags=re.IGNORECASE), "he is")]
+templates += [(re.compile(r"\bthats\b", flags=re.IGNORECASE), "that is")]
+templates += [(re.compile(r"\bwhats\b", flags=re.IGNORECASE), "what is")]
+templates += [(re.compile(r"\bwheres\b", flags=re.IGNORECASE), "where is")]
+templates += [(re.compile(r"\bhows\b", flags=re.IGNORECASE), "how is")]
+templates += [(re.compile(r"\bwhos\b", flags=re.IGNORECASE), "who is")]
+templates += [(re.compile(r"\bwhys\b", flags=re.IGNORECASE), "why is")]
+
+templates += [(re.compile(r"\bbtw\b", flags=re.IGNORECASE), "by the way")]
+templates += [(re.compile(r"\bcu\b", flags=re.IGNORECASE), "see you")]
+templates += [(re.compile(r"\bidk\b", flags=re.IGNORECASE), "i don't know")]
+templates += [(re.compile(r"\bimo\b", flags=re.IGNORECASE), "in my opinion")]
+templates += [(re.compile(r"\bomg\b", flags=re.IGNORECASE), "oh my god")]
+templates += [(re.compile(r"\bthx\b", flags=re.IGNORECASE), "thank you")]
+templates += [(re.compile(r"\bthnx\b", flags=re.IGNORECASE), "thank you")]
+templates += [(re.compile(r"\bthanks\b", flags=re.IGNORECASE), "thank you")]
+templates += [(re.compile(r"\bwtf\b", flags=re.IGNORECASE), "what the fuck")]
+templates += [(re.compile(r"\bnp\b", flags=re.IGNORECASE), "no problem")]
+templates += [(re.compile(r"\bnvm\b", flags=re.IGNORECASE), "never mind")]
+templates += [(re.compile(r"\bdnt\b", flags=re.IGNORECASE), "don't")]
+templates += [(re.compile(r"\bgud\b", flags=re.IGNORECASE), "good")]
+templates += [(re.compile(r"\bgotcha\b", flags=re.IGNORECASE), "got you")]
+templates += [(re.compile(r"\bh8\b", flags=re.IGNORECASE), "hate")]
+templates += [(re.compile(r"\bhav\b", flags=re.IGNORECASE), "have")]
+templates += [(re.compile(r"\bhru\b", flags=re.IGNORECASE), "how are you")]
+templates += [(re.compile(r"\bidc\b", flags=re.IGNORECASE), "i don't care")]
+templates += [(re.compile(r"\bk\b", flags=re.IGNORECASE), "okay")]
+templates += [(re.compile(r"\bpls\b", flags=re.IGNORECASE), "please")]
+templates += [(re.compile(r"\bplz\b", flags=re.IGNORECASE), "please")]
+templates += [(re.compile(r"\bzup\b", flags=re.IGNORECASE), "what's up")]
+templates += [(re.compile(r"\bwazup\b", flags=re.IGNORECASE), "what's up")]
+templates += [(re.compile(r"\bwazzup\b", flags=re.IGNORECASE), "what's up")]
+templates += [(re.compile(r"\bwhatsup\b", flags=re.IGNORECASE), "what's up")]
+templates += [(re.compile(r"\bwanna\b", flags=re.IGNORECASE), "want to")]
+templates += [(re.compile(r"\bgonna\b", flags=re.IGNORECASE), "going to")]
+
+templates += [(re.compile(r"\s+"), " ")]
+
+
+def preprocess_sequential(text):
+    """Reference implementation, applies templates one by one."""
+    for templ, new_str in templates:
+        text = re.sub(templ, new_str, text)
+    return text.strip()
+
+
+def _word_variants(templ):
+    r"""All strings matched by a word template `\bword\b`, `'?` is the only special symbol in such templates."""
+    pattern = templ.pattern[2:-2].lower()
+    variants = [""]
+    for part in re.split(r"(.'\?)", pattern):
+        if part.endswith("'?"):
+            variants = [v + part[0] + suffix for v in variants for suffix in ["'", ""]]
+        else:
+            variants = [v + part for v in variants]
+    return variants
+
+
+def _is_word_template(templ):
+    pattern = templ.pattern
+    if not (pattern.startswith(r"\b") and pattern.endswith(r"\b")):
+        return False
+    return re.fullmatch(r"[\w']+", pattern[2:-2].replace("'?", "")) is not None
+
+
+def _boundaries(chunk):
+    is_word = [bool(re.match(r"\w", c)) for c in chunk]
+    return [k for k in range(1, len(chunk)) if is_word[k - 1] != is_word[k]]
+
+
+def _feeds(new_str, templ):
+    """Checks whether a replacement `new_str` together with its neighbours could be matched by `templ`."""
+    chunks = new_str.lower().split()
+    for variant in _word_variants(templ):
+        for i, chunk in enumerate(chunks):
+            if variant in chunk:
+                return True
+            # the match covers the replacement and spreads over the text around it
+            if len(chunks) == 1 and chunk in variant:
+                return True
+            # the match starts in the text before the replacement and ends inside of its first chunk
+            if i == 0 and any(variant.endswith(chunk[:k]) for k in _boundaries(chunk)):
+                return True
+            # the match starts inside of the last chunk and ends in the text after the replacement
+            if i == len(chunks) - 1 and any(variant.startswith(chunk[k:]) for k in _boundaries(chunk)):
+                return True
+            if i == 0 and len(chunks) > 1 and variant.endswith(chunk):
+                return True
+            if i == len(chunks) - 1 and len(chunks) > 1 and variant.startswith(chunk):
+                return True
+    return False
+
+
+def _dispatch(replacements, match):
+    return replacements[match.lastgroup]
+
+
+def compile_templates(templates):
+    r"""
+    Merges templates into as few alternation regexes as possible keeping the result of sequential application.
+
+    A template starts a new alternation if a replacement of the current one could produce its match
+    (`u` -> `you` feeds `you'?re` in `u're`). Word templates `\bword\b` of an alternation share the boundaries,
+    so the engine tries alternatives only at word starts. Other templates are applied as is.
+
+    Returns:
+        list of (regex, replacement string or function) to be applied one after another
+    """
+    groups = [[]]
+    for templ, new_str in templates:
+        if groups[-1] and (
+            not _is_word_template(templ)
+            or not _is_word_template(groups[-1][-1][0])
+            or templ.flags != groups[-1][-1][0].flags
+            or any(_feeds(prev_str, templ) for _, prev_str in groups[-1])
+        ):
+            groups.append([])
+        groups[-1].append((templ, new_str))
+
+    compiled = []
+    for group in groups:
+        if len(group) == 1:
+            compiled.append(group[0])
+            continue
+        # alternatives are split into branches by the first letter: only one branch can match at a position,
+        # so the order of templates is kept while the engine checks just a few alternatives at each word start
+        flags = group[0][0].flags
+        branches = {}
+        replacements = {}
+        for i, (templ, new_str) in enumerate(group):
+            word = templ.pattern[2:-2]
+            first = word[0].lower() if flags & re.IGNORECASE else word[0]
+            branches.setdefault(first, []).append(f"(?P<t{i}>{word[1:]})")
+            replacements[f"t{i}"] = new_str
+        regex = r"\b(?:" + "|".join(f"{first}(?:{'|'.join(alts)})" for first, alts in branches.items()) + r")\b"
+        compiled.append((re.compile(regex, flags), partial(_dispatch, replacements)))
+    return compiled
+
+
+compiled_templates = compile_templates(templates)
+
+
+def preprocess(text):
+    for regex, repl in compiled_templates:
+        text = regex.sub(repl, text)
+    return text.strip()
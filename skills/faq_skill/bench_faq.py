@@ -0,0 +1,121 @@
+import argparse
+import random
+import time
+
+from sklearn.feature_extraction.text import TfidfVectorizer
+from sklearn.linear_model import LogisticRegression
+
+from faq_index import TfidfIndexRanker
+
+
+def make_faq(n_answers, n_questions=4, seed=42):
+    """Every answer gets its own topic words, its questions are random mixes of them and common words"""
+    rng = random.Random(seed)
+    common = ["what", "how", "is", "the", "harvester", "combine", "rover", "can", "i", "do", "my", "to", "a"]
+    questions, answers, queries, query_answers = [], [], [], []
+    for i in range(n_answers):
+        topic = [f"w{rng.randrange(5 * n_answers)}" for _ in range(4)]
+        for j in range(n_questions + 1):
+            words = rng.sample(topic, 3) + rng.sample(common, 3)
+            rng.shuffle(words)
+            # the last question of every answer is held out as a query
+            if j < n_questions:
+                questions.append(" ".join(words))
+                answers.append(f"answer {i}")
+            else:
+                queries.append(" ".join(words))
+                query_answers.append(f"answer {i}")
+    return questions, answers, queries, query_answers
+
+
+class LogregEngine:
+    """TF-IDF with the classifier of faq_config.json"""
+
+    def fit(self, questions, answers):
+        self.vectorizer = TfidfVectorizer().fit(questions)
+        self.model = LogisticRegression(C=1000, penalty="l2").fit(self.vectorizer.transform(questions), answers)
+
+    def __call__(self, queries):
+        return list(self.model.predict(self.vectorizer.transform(queries)))
+
+
+class IndexEngine:
+    """TF-IDF with the index of faq_index_config.json"""
+
+    def fit(self, questions, answers):
+        self.vectorizer = TfidfVectorizer().fit(questions)
+        self.model = TfidfIndexRanker(top_k=5)
+        self.model.fit(self.vectorizer.transform(questions), answers)
+
+    def __call__(self, queries):
+        return self.model(self.vectorizer.transform(queries))[0]
+
+
+def bench(engine, questions, answers, queries, batch_size):
+    st_time = time.time()
+    engine.fit(questions, answers)
+    fit_time = time.time() - st_time
+    st_time = time.time()
+    result = []
+    for i in range(0, len(queries), batch_size):
+        result += engine(queries[i : i + batch_size])
+    return result, fit_time, (time.time() - st_time) / len(queries)
+
+
+def bench_sizes(sizes, max_logreg_answers, batch_size):
+    for n_answers in sizes:
+        questions, answers, queries, query_answers = make_faq(n_answers)
+        line = f"answers: {n_answers:>6}"
+        results = {}
+        for name, engine in [("logreg", LogregEngine()), ("index", IndexEngine())]:
+            if name == "logreg" and n_answers > max_logreg_answers:
+                line += f" | {name}: skipped"
+                continue
+            result, fit_time, latency = bench(engine, questions, answers, queries, batch_size)
+            accuracy = sum(a == b for a, b in zip(result, query_answers)) / len(queries)
+            line += f" | {name}: fit {fit_time:.2f}s, {latency * 1000:.3f}ms/query, accuracy {accuracy:.3f}"
+            results[name] = result
+        if len(results) == 2:
+            agreement = sum(a == b for a, b in zip(results["logreg"], results["index"])) / len(queries)
+            line += f" | agreement {agreement:.3f}"
+        print(line)
+
+
+def check_parity(config_path):
+    """Compares answers of both configs to the questions of the FAQ dataset"""
+    from deeppavlov.core.common.file import read_json
+    from deeppavlov.dataset_readers.faq_reader import FaqDatasetReader
+
+    from faq_index import FAQ_CONFIGS, build_faq
+
+    models = {name: build_faq(read_json(f"{config_path}/{config}")) for name, config in FAQ_CONFIGS.items()}
+    reader_config = read_json(f"{config_path}/{FAQ_CONFIGS['logreg']}")["dataset_reader"]
+    data = FaqDatasetReader().read(**{key: value for key, value in reader_config.items() if key != "class_name"})
+    questions = [question for question, _ in data["train"]]
+    results = {}
+    for name, model in models.items():
+        st_time = time.time()
+        results[name] = model(questions)[0]
+        print(f"{name}: {(time.time() - st_time) / len(questions) * 1000:.3f}ms/question")
+    mismatches = [(q, a, b) for q, a, b in zip(questions, results["logreg"], results["index"]) if a != b]
+    for question, old, new in mismatches[:10]:
+        print(f"MISMATCH {question!r}: {old!r} != {new!r}")
+    print(f"questions: {len(questions)}, mismatches: {len(mismatches)}")
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Compare logreg and index FAQ engines")
+    parser.add_argument("--sizes", type=int, nargs="+", default=[100, 1000, 5000, 20000, 50000])
+    parser.add_argument("--max-logreg-answers", type=int, default=3000, help="larger FAQs do not fit in memory")
+    parser.add_argument("--batch-size", type=int, default=32)
+    parser.add_argument("--parity", metavar="CONFIG_DIR", help="check parity of the configs on the FAQ dataset")
+    args = parser.parse_args()
+
+    if args.parity:
+        check_parity(args.parity)
+    else:
+        bench_sizes(args.sizes, args.max_logreg_answers, args.batch_size)
+
+
+if __name__ == "__main__":
+    main()
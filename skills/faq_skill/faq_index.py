@@ -0,0 +1,102 @@
+import logging
+import pickle
+from typing import List, Tuple
+
+import numpy as np
+from scipy.sparse import csr_matrix, vstack
+from sklearn.preprocessing import normalize
+
+from deeppavlov import build_model, train_model
+from deeppavlov.core.common.registry import register
+from deeppavlov.core.models.estimator import Estimator
+
+logger = logging.getLogger(__name__)
+
+# "logreg" is the TF-IDF classifier with one class per answer,
+# "index" is top-k search over the TF-IDF index of known questions for large FAQs
+FAQ_CONFIGS = {"logreg": "faq_config.json", "index": "faq_index_config.json"}
+
+
+@register("faq_tfidf_index")
+class TfidfIndexRanker(Estimator):
+    """
+    FAQ answers by top-k cosine similarity of the question to the known questions.
+
+    Vectors of the known questions are kept as an inverted index (terms x questions), so a query is
+    scored against the questions sharing at least one term with it only, and fitting is just
+    the indexing of the vectors. Unlike the classifier with one class per answer, neither of them
+    grows with the number of answers.
+
+    Args:
+        top_k: number of the most similar questions the answers are taken from
+        save_path: path to save the index to
+        load_path: path to load the index from
+    """
+
+    def __init__(self, top_k: int = 5, save_path: str = None, load_path: str = None, **kwargs):
+        super().__init__(save_path=save_path, load_path=load_path, **kwargs)
+        self.top_k = top_k
+        self.index = None
+        self.answers = []
+        self.answer_ids = np.array([], dtype=np.int64)
+        if self.load_path is not None and self.load_path.exists():
+            self.load()
+
+    def fit(self, questions_vectors, answers: List[str]) -> None:
+        if not isinstance(questions_vectors, csr_matrix):
+            questions_vectors = vstack(questions_vectors).tocsr()
+        vocab = {}
+        self.answer_ids = np.array([vocab.setdefault(answer, len(vocab)) for answer in answers], dtype=np.int64)
+        self.answers = list(vocab)
+        self.index = normalize(questions_vectors).T.tocsr()
+        logger.info(f"faq_tfidf_index: {len(answers)} questions, {len(self.answers)} answers indexed")
+
+    def search(self, queries_vectors) -> List[List[Tuple[int, float]]]:
+        """Returns ids of the `top_k` most similar questions with their similarities for every query"""
+        scores = (normalize(queries_vectors) @ self.index).tocsr()
+        results = []
+        for i in range(scores.shape[0]):
+            row = scores.indptr[i], scores.indptr[i + 1]
+            ids, similarities = scores.indices[row[0] : row[1]], scores.data[row[0] : row[1]]
+            if len(ids) > self.top_k:
+                top = np.argpartition(-similarities, self.top_k - 1)[: self.top_k]
+                ids, similarities = ids[top], similarities[top]
+            # ties are broken by the question order, so the result does not depend on the sparse layout
+            order = np.lexsort((ids, -similarities))
+            results.append(list(zip(ids[order].tolist(), similarities[order].tolist())))
+        return results
+
+    def __call__(self, queries_vectors) -> Tuple[List[str], List[List[float]]]:
+        """Returns the best answer and similarities of the top answers for every query"""
+        answers, similarities = [], []
+        for questions in self.search(queries_vectors):
+            top_answers = {}
+            for question_id, similarity in questions:
+                top_answers.setdefault(self.answer_ids[question_id], similarity)
+            if not top_answers:
+                # the query has no words in common with the known questions
+                answers.append("")
+                similarities.append([0.0])
+                continue
+            answers.append(self.answers[next(iter(top_answers))])
+            similarities.append(list(top_answers.values()))
+        return answers, similarities
+
+    def save(self) -> None:
+        logger.info(f"Saving faq_tfidf_index to {self.save_path}")
+        with open(self.save_path, "wb") as f:
+            pickle.dump({"index": self.index, "answers": self.answers, "answer_ids": self.answer_ids}, f)
+
+    def load(self) -> None:
+        logger.info(f"Loading faq_tfidf_index from {self.load_path}")
+        with open(self.load_path, "rb") as f:
+            data = pickle.load(f)
+        self.index, self.answers, self.answer_ids = data["index"], data["answers"], data["answer_ids"]
+
+
+def build_faq(faq_config):
+    faq = build_model(faq_config, download=True)
+    if getattr(faq.get_main_component(), "index", True) is None:
+        # the index is built from the FAQ dataset on the first start
+        faq = train_model(faq_config, download=True)
+    return faq
@@ -7,11 +7,14 @@ import time
 
 from flask import Flask, request, jsonify
 
-# from os import getenv
+from os import getenv
 
-from deeppavlov import build_model
+from deeppavlov.core.common.chainer import Chainer
 from deeppavlov.core.common.file import read_json
 
+from cache import LRUCache
+from faq_index import FAQ_CONFIGS, build_faq
+
 
 logging.basicConfig(format="%(asctime)s - %(name)s - %(levelname)s - %(message)s", level=logging.INFO)
 logger = logging.getLogger(__name__)
@@ -20,34 +23,100 @@ app = Flask(__name__)
 
 
 class FaqWrapper:
-    def __init__(self, faq_config_path):
-        faq_config = read_json(f"{faq_config_path}/faq_config.json")
-        self.faq = build_model(faq_config, download=True)
-
-    def __call__(self, sentence):
-        faq_response = self.faq([sentence])
-
-        response = faq_response[0][0]
-        confidences = faq_response[1][0]
-
-        confidence = max(confidences)
-
-        logger.info("faq_skill: response=" + response)
-        logger.info("faq_skill: confidence=" + str(confidence))
-
-        # confidence = 1.0  # should it be 1.0 or not?
-        # confidence = confidence.astype(float)
-        return response, confidence
-
-
-faq = FaqWrapper("dp_minimal_demo_dir")
+    """
+    FAQ model answering a batch of sentences with one pass of the pipeline.
+
+    Answers are cached by lemmatized questions, so questions differing in word forms only
+    skip TF-IDF and the answer model. Lemmatization is done once for the whole batch,
+    the rest of the pipeline is run for the cache misses only.
+    If the `backend` model can not be built, the classifier pipeline is used.
+    """
+
+    def __init__(self, faq_config_path, backend="logreg", cache_size=10000, cache_ttl=None):
+        try:
+            self.faq = build_faq(read_json(f"{faq_config_path}/{FAQ_CONFIGS[backend]}"))
+        except Exception:
+            if backend == "logreg":
+                raise
+            logger.exception(f"faq_skill: {backend} backend is not available, falling back to logreg")
+            backend = "logreg"
+            self.faq = build_faq(read_json(f"{faq_config_path}/{FAQ_CONFIGS[backend]}"))
+        self.backend = backend
+        self.cache = LRUCache(maxsize=cache_size, ttl=cache_ttl)
+        self.lemmas_key = "q_lem"
+        # the pipeline is split after the lemmatizer, lemmatized sentences are both cache keys and
+        # inputs of the vectorizer
+        pipe = self.faq.pipe
+        split = next(i for i, (_, out_params, _) in enumerate(pipe) if self.lemmas_key in out_params) + 1
+        self.lemmatizer_pipe, self.answer_pipe = pipe[:split], pipe[split:]
+        self.metrics = {"requests": 0, "sentences": 0, "total_time": 0.0, "model_time": 0.0}
+
+    def lemmatize(self, sentences):
+        return Chainer._compute(
+            sentences, param_names=self.faq.in_x, pipe=self.lemmatizer_pipe, targets=[self.lemmas_key]
+        )
+
+    def answer(self, lemmas):
+        answers, probas = Chainer._compute(
+            lemmas, param_names=[self.lemmas_key], pipe=self.answer_pipe, targets=self.faq.out_params
+        )
+        return [(answer, float(max(confidences))) for answer, confidences in zip(answers, probas)]
+
+    def __call__(self, sentences):
+        st_time = time.time()
+        lemmas = self.lemmatize(sentences)
+        results = [self.cache.get(lemma) for lemma in lemmas]
+
+        # every unique missing question goes to the model once
+        misses = list(dict.fromkeys(lemma for lemma, result in zip(lemmas, results) if result is None))
+        model_time = 0.0
+        if misses:
+            model_st_time = time.time()
+            answers = dict(zip(misses, self.answer(misses)))
+            model_time = time.time() - model_st_time
+            for lemma in misses:
+                self.cache.put(lemma, answers[lemma])
+            results = [answers[lemma] if result is None else result for lemma, result in zip(lemmas, results)]
+
+        total_time = time.time() - st_time
+        self.metrics["requests"] += 1
+        self.metrics["sentences"] += len(sentences)
+        self.metrics["total_time"] += total_time
+        self.metrics["model_time"] += model_time
+        for response, confidence in results:
+            logger.info("faq_skill: response=" + response)
+            logger.info("faq_skill: confidence=" + str(confidence))
+        logger.info(
+            f"faq_skill: {len(sentences)} sentences, {len(misses)} answered by the model in {model_time:.3f}s, "
+            f"total {total_time:.3f}s, cache hit rate {self.cache.stats()['hit_rate']:.3f}"
+        )
+        return results
+
+    def stats(self):
+        requests = self.metrics["requests"]
+        return {
+            "backend": self.backend,
+            "cache": self.cache.stats(),
+            **self.metrics,
+            "mean_latency": self.metrics["total_time"] / requests if requests else 0.0,
+            "mean_model_latency": self.metrics["model_time"] / requests if requests else 0.0,
+        }
+
+
+FAQ_CACHE_TTL = float(getenv("FAQ_CACHE_TTL", 0)) or None
+faq = FaqWrapper(
+    "dp_minimal_demo_dir",
+    backend=getenv("FAQ_BACKEND", "logreg"),
+    cache_size=int(getenv("FAQ_CACHE_SIZE", 10000)),
+    cache_ttl=FAQ_CACHE_TTL,
+)
 
 
 @app.route("/test", methods=["POST"])
 def test():
     sentence = request.json["sentence"]
 
-    response, conf = faq(sentence)
+    ((response, conf),) = faq([sentence])
 
     return str(response)
     # return request.json["sentence"]
@@ -59,9 +128,7 @@ def respond():
 
     dialogs = request.json["dialogs"]
 
-    responses = []
-    confidences = []
-
+    sentences = []
     for dialog in dialogs:
         sentence = dialog["human_utterances"][-1]["annotations"].get("spelling_preprocessing")
 
@@ -69,14 +136,18 @@ def respond():
             logger.warning("Not found spelling preprocessing annotation")
             sentence = dialog["human_utterances"][-1]["text"]
 
-        response, conf = faq(sentence)
+        sentences.append(sentence)
 
-        responses.append(response)
-        confidences.append(conf)
+    responses = faq(sentences) if sentences else []
 
     total_time = time.time() - st_time
     logger.info(f"faq_skill exec time = {total_time:.3f}s")
-    return jsonify(list(zip(responses, confidences)))
+    return jsonify(responses)
+
+
+@app.route("/metrics", methods=["GET"])
+def metrics():
+    return jsonify(faq.stats())
 
 
 if __name__ == "__main__":
@@ -0,0 +1,153 @@
+from typing import List, Tuple
+
+import numpy as np
+
+from deeppavlov.models.go_bot.dto.dataset_features import (
+    BatchDialoguesDataset,
+    BatchDialoguesFeatures,
+    DialogueDataEntry,
+    UtteranceDataEntry,
+    UtteranceFeatures,
+)
+from deeppavlov.models.go_bot.go_bot import GoBot
+from deeppavlov.models.go_bot.nlg.dto.nlg_response_interface import NLGResponseInterface
+from deeppavlov.models.go_bot.nlu.dto.nlu_response import NLUResponse
+from deeppavlov.models.go_bot.nlu.dto.text_vectorization_response import TextVectorizationResponse
+from deeppavlov.models.go_bot.policy.dto.policy_prediction import PolicyPrediction
+from deeppavlov.models.go_bot.tracker.dialogue_state_tracker import DialogueStateTracker
+
+
+class BatchedGoBot:
+    """
+    Real-time inference of GoBot for utterances of several dialogs at once.
+
+    Does the same as `GoBot._realtime_infer` for every dialog, but NLU components and the policy network
+    are run once for the whole batch, and NLU responses are returned with the responses of the bot,
+    so slots are not extracted once more.
+    """
+
+    def __init__(self, go_bot: GoBot):
+        self.go_bot = go_bot
+
+    def nlu(self, texts: List[str]) -> List[NLUResponse]:
+        """Batched `NLUManager.nlu`"""
+        nlu_manager = self.go_bot.nlu_manager
+        tokens = nlu_manager.tokenizer([text.lower().strip() for text in texts])
+        slots = [None] * len(texts)
+        if callable(nlu_manager.slot_filler):
+            slots = nlu_manager.slot_filler(tokens)
+        intents = [[]] * len(texts)
+        if callable(nlu_manager.intent_classifier):
+            intents = nlu_manager.intent_classifier([" ".join(utt_tokens) for utt_tokens in tokens])[1]
+        return [NLUResponse(*response) for response in zip(slots, intents, tokens)]
+
+    def extract_features(
+        self, nlu_response: NLUResponse, tracker: DialogueStateTracker, keep_tracker_state: bool = False
+    ) -> UtteranceFeatures:
+        """`GoBot.extract_features_from_utterance_text` for the utterance which NLU is already done for"""
+        data_handler, policy = self.go_bot.data_handler, self.go_bot.policy
+        tokens_bow_encoded = data_handler.bow_encode_tokens(nlu_response.tokens)
+
+        tokens_embeddings_padded = np.array([], dtype=np.float32)
+        tokens_aggregated_embedding = np.array([], dtype=np.float32)
+        if policy.has_attn():
+            tokens_embeddings_padded = data_handler.calc_tokens_embeddings(
+                policy.get_attn_window_size(), policy.get_attn_hyperparams().token_size, nlu_response.tokens
+            )
+        else:
+            tokens_aggregated_embedding = data_handler.calc_tokens_mean_embedding(nlu_response.tokens)
+        nlu_response.set_tokens_vectorized(
+            TextVectorizationResponse(tokens_bow_encoded, tokens_aggregated_embedding, tokens_embeddings_padded)
+        )
+
+        if not keep_tracker_state:
+            tracker.update_state(nlu_response)
+        tracker_knowledge = tracker.get_current_knowledge()
+        digitized_policy_features = policy.digitize_features(nlu_response, tracker_knowledge)
+        return UtteranceFeatures(nlu_response, tracker_knowledge, digitized_policy_features)
+
+    def predict(self, batch_features: BatchDialoguesFeatures, trackers: List[DialogueStateTracker]):
+        """Runs the policy network once for dialogs of one utterance, returns predictions of every dialog"""
+        policy = self.go_bot.policy
+        # states of trackers are [1, hidden_size] arrays, they are stacked into [batch_size, hidden_size] ones
+        states_c, states_h = (
+            np.concatenate([np.reshape(tracker.network_state[i], (-1, policy.hidden_size)) for tracker in trackers])
+            for i in (0, 1)
+        )
+        feed_dict = {
+            policy._dropout_keep_prob: 1.0,
+            policy._initial_state: (states_c, states_h),
+            policy._utterance_mask: batch_features.b_padded_dialogue_length_mask,
+            policy._features: batch_features.b_featuress,
+            policy._action_mask: batch_features.b_action_masks,
+        }
+        if policy.attention_params:
+            feed_dict[policy._emb_context] = batch_features.b_tokens_embeddings_paddeds
+            feed_dict[policy._key] = batch_features.b_attn_keys
+
+        probs, prediction, state = policy.sess.run([policy._probs, policy._prediction, policy._state], feed_dict)
+        # probs are squeezed by the network, so they have the shapes of a single dialog prediction after the split
+        probs = np.reshape(probs, (len(trackers), -1))
+        prediction = np.reshape(prediction, (len(trackers),))
+        return [
+            PolicyPrediction(probs[i], prediction[i], state[0][i : i + 1], state[1][i : i + 1])
+            for i in range(len(trackers))
+        ]
+
+    def _infer(self, nlu_responses, trackers, keep_tracker_state=False) -> List[Tuple[NLGResponseInterface, int]]:
+        """Returns responses and ids of predicted actions"""
+        batch_dataset = BatchDialoguesDataset(max_dialogue_length=1)
+        for nlu_response, tracker in zip(nlu_responses, trackers):
+            dialogue_data_entry = DialogueDataEntry()
+            features = self.extract_features(nlu_response, tracker, keep_tracker_state)
+            dialogue_data_entry.append(UtteranceDataEntry.from_features(features))
+            batch_dataset.append(dialogue_data_entry)
+        batch_features = batch_dataset.features
+        predictions = self.predict(batch_features, trackers)
+
+        nlg_manager = self.go_bot.nlg_manager
+        responses = []
+        for tracker, policy_prediction in zip(trackers, predictions):
+            tracker.update_previous_action(policy_prediction.predicted_action_ix)
+            tracker.network_state = policy_prediction.get_network_state()
+            tracker_slotfilled_state = tracker.fill_current_state_with_db_results()
+            response = nlg_manager.decode_response(batch_features, policy_prediction, tracker_slotfilled_state)
+            responses.append((response, policy_prediction.predicted_action_ix))
+        return responses
+
+    def _infer_dialogs(self, texts, user_ids) -> List[Tuple[List[NLGResponseInterface], NLUResponse]]:
+        pool = self.go_bot.multiple_user_state_tracker
+        trackers = [pool.get_or_init_tracker(user_id) for user_id in user_ids]
+        nlu_responses = self.nlu(texts)
+        responses = self._infer(nlu_responses, trackers)
+        results = [[response] for response, _ in responses]
+
+        # after an api call the next action is predicted for the same utterance
+        api_call_action_id = self.go_bot.nlg_manager.get_api_call_action_id()
+        api_calls = [i for i, (_, action_id) in enumerate(responses) if action_id == api_call_action_id]
+        if api_calls:
+            for i in api_calls:
+                trackers[i].make_api_call()
+            api_responses = self._infer(
+                [nlu_responses[i] for i in api_calls], [trackers[i] for i in api_calls], keep_tracker_state=True
+            )
+            for i, (response, _) in zip(api_calls, api_responses):
+                results[i].append(response)
+        return list(zip(results, nlu_responses))
+
+    def __call__(self, texts: List[str], user_ids: List) -> List[Tuple[List[NLGResponseInterface], NLUResponse]]:
+        """Returns responses of the bot and NLU responses for utterances of dialogs of `user_ids`"""
+        results = [None] * len(texts)
+        remaining = list(range(len(texts)))
+        # a tracker can be updated by one utterance of a batch only, utterances of the same dialog go one by one
+        while remaining:
+            first, seen = [], set()
+            for i in remaining:
+                if user_ids[i] not in seen:
+                    seen.add(user_ids[i])
+                    first.append(i)
+            for i, result in zip(first, self._infer_dialogs([texts[i] for i in first], [user_ids[i] for i in first])):
+                results[i] = result
+            done = set(first)
+            remaining = [i for i in remaining if i not in done]
+        return results
@@ -0,0 +1,63 @@
+import re
+from typing import Dict, List, Sequence, Tuple, Union
+
+
+class ResponseTemplate:
+    """
+    Response template parsed once into literal parts and slots, so only the slots it references are resolved
+    and the response is assembled with one join.
+
+    A list slot in the `<object> <slot> is` context is filled with `none is`, `<object> <id> is`
+    or `<object>s <id>, <id> are` depending on the number of ids, out of this context it is filled
+    only if there is a single id. Value slots are filled with strings.
+
+    Args:
+        text: template text
+        list_slots: names of list slots mapped to names of their objects, e.g. `{"FULL_IDS": "harvester"}`
+        value_slots: names of value slots
+    """
+
+    def __init__(self, text: str, list_slots: Dict[str, str], value_slots: Sequence[str]):
+        contexts = {f"{object} {slot} is": slot for slot, object in list_slots.items()}
+        # longer names go first, so `ROVER_FOR_TRIP_ID` is not taken for `ID`
+        names = sorted([*list_slots, *value_slots], key=len, reverse=True)
+        pattern = re.compile(
+            f"(?P<context>{'|'.join(map(re.escape, contexts))})|(?P<name>{'|'.join(map(re.escape, names))})"
+        )
+
+        self.parts: List[Union[str, Tuple[str, str, bool]]] = []
+        self.slots = set()
+        pos = 0
+        for match in pattern.finditer(text):
+            self.parts.append(text[pos : match.start()])
+            if match["context"]:
+                slot = contexts[match["context"]]
+                self.parts.append((slot, list_slots[slot], True))
+            else:
+                slot = match["name"]
+                self.parts.append((slot, list_slots.get(slot), False))
+            self.slots.add(slot)
+            pos = match.end()
+        self.parts.append(text[pos:])
+        self.parts = [part for part in self.parts if part != ""]
+
+    def fill(self, values: Dict[str, Union[str, Sequence[str]]]) -> str:
+        """`values` has lists of ids for the list slots of the template and strings for its value slots"""
+        result = []
+        for part in self.parts:
+            if isinstance(part, str):
+                result.append(part)
+                continue
+            slot, object, in_context = part
+            value = values[slot]
+            if isinstance(value, str):
+                result.append(value)
+            elif not in_context:
+                result.append(value[0] if len(value) == 1 else slot)
+            elif len(value) == 0:
+                result.append("none is")
+            elif len(value) == 1:
+                result.append(f"{object} {value[0]} is")
+            else:
+                result.append(f"{object}s {', '.join(value)} are")
+        return "".join(result)
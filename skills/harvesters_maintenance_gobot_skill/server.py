@@ -1,8 +1,10 @@
 import logging
+import threading
 import time
 import random
 import re
 import json
+import uuid
 
 from flask import Flask, request, jsonify
 from os import getenv
@@ -10,10 +12,33 @@ from os import getenv
 from deeppavlov import build_model
 from deeppavlov.core.common.file import read_yaml, read_json
 
+from batched_gobot import BatchedGoBot
+from response_templates import ResponseTemplate
+from tracker_pool import TrackerPool
+
 
 logging.basicConfig(format="%(asctime)s - %(name)s - %(levelname)s - %(message)s", level=logging.INFO)
 logger = logging.getLogger(__name__)
 
+# list slots of templates with (object, inner status) of their ids
+LIST_SLOTS = {
+    "full_ids": ("harvester", "full"),
+    "working_ids": ("harvester", "working"),
+    "broken_ids": ("harvester", "stall"),
+    "inactive_ids": ("harvester", "inactive"),
+    "available_rover_ids": ("rover", "available"),
+    "inactive_rover_ids": ("rover", "inactive"),
+    "broken_rover_ids": ("rover", "stall"),
+}
+VALUE_SLOTS = ["total_harvesters_number", "rover_for_trip_id", "harvester_id", "harvester_status"]
+
+EMPTY_TEMPLATE = ResponseTemplate("", {}, [])
+
+TRACKERS_SIZE = int(getenv("GOBOT_TRACKERS_SIZE", 10000))
+TRACKERS_IDLE_TIMEOUT = float(getenv("GOBOT_TRACKERS_IDLE_TIMEOUT", 3600))
+# SQLite file to share dialog states between workers, states are kept only in memory if not set
+TRACKERS_STORE_PATH = getenv("GOBOT_TRACKERS_STORE_PATH")
+
 app = Flask(__name__)
 
 
@@ -23,32 +48,64 @@ class GoBotWrapper:
         domain_yml_path = "dp_minimal_demo_dir/domain.yml"
 
         self.response_templates = read_yaml(domain_yml_path)["responses"]
+        # braces of slots are dropped from responses, so templates are parsed without them
+        list_slots = {slot: object for slot, (object, _) in LIST_SLOTS.items()}
+        self.parsed_templates = {
+            act: ResponseTemplate(templates[0]["text"].replace("{", "").replace("}", ""), list_slots, VALUE_SLOTS)
+            for act, templates in self.response_templates.items()
+        }
         self.gobot = build_model(gobot_config)
+        # dialog states are kept per dialog id, the model itself is stateless and is shared by all dialogs
+        self.go_bot = self.gobot.pipe[-1][-1]
+        self.trackers = TrackerPool(
+            self.go_bot.dialogue_state_tracker, TRACKERS_SIZE, TRACKERS_IDLE_TIMEOUT, TRACKERS_STORE_PATH
+        )
+        self.go_bot.multiple_user_state_tracker = self.trackers
+        self.batched_gobot = BatchedGoBot(self.go_bot)
+        self._lock = threading.Lock()
 
         self.DATABASE, self.PREV_UPDATE_TIME = self._update_database()
-
-    def __call__(self, sentence):
-        gobot_response = self.gobot([sentence])[0][0]
-
-        uttr_response_action = gobot_response.actions_tuple
-        confidence = gobot_response.policy_prediction.probs[gobot_response.policy_prediction.predicted_action_ix]
-
-        confidence = confidence.astype(float)
-        uttr_slots = self.gobot.pipe[-1][-1].nlu_manager.nlu(sentence).slots
-        return {"act": uttr_response_action, "slots": uttr_slots}, confidence
+        # ids of statuses are memoized until the next update of the database
+        self._ids_with_statuses = {}
+
+    def __call__(self, sentences, dialog_ids):
+        """Runs the batch of utterances of the dialogs through the model at once"""
+        # utterances without dialog id get trackers of their own which are dropped after the request
+        request_ids = {i: f"request-{uuid.uuid4().hex}" for i, dialog_id in enumerate(dialog_ids) if dialog_id is None}
+        dialog_ids = [request_ids.get(i, dialog_id) for i, dialog_id in enumerate(dialog_ids)]
+        with self._lock:
+            results = self.batched_gobot(sentences, dialog_ids)
+            for dialog_id in dict.fromkeys(dialog_ids):
+                if dialog_id in request_ids.values():
+                    self.trackers.discard(dialog_id)
+                else:
+                    self.trackers.save(dialog_id)
+
+        outputs = []
+        for gobot_responses, nlu_response in results:
+            gobot_response = gobot_responses[0]
+            uttr_response_action = gobot_response.actions_tuple
+            confidence = gobot_response.policy_prediction.probs[gobot_response.policy_prediction.predicted_action_ix]
+
+            confidence = confidence.astype(float)
+            # slots are taken from NLU of the policy pass
+            outputs.append(({"act": uttr_response_action, "slots": nlu_response.slots}, confidence))
+        return outputs
 
     def getNlg(self, gobot_response):
         act = gobot_response["act"][0]
         slots = gobot_response["slots"]
-        response_template = self.response_templates.get(act, [{"text": ""}])[0]["text"]
+        response_template = self.parsed_templates.get(act, EMPTY_TEMPLATE)
 
         generated = self._generate_response_from_storage(response_template, slots)
 
         return generated
 
-    def reset(self):
-        self.gobot.reset()
-        self("start")
+    def reset(self, dialog_id=None):
+        """Resets the state of the dialog, states of all dialogs if `dialog_id` is None"""
+        self.trackers.reset(dialog_id)
+        if dialog_id is not None:
+            self(["start"], [dialog_id])
 
     # region storage interaction logic
     def _update_database(self):
@@ -61,6 +118,11 @@ class GoBotWrapper:
         """Return ids of objects with given (inner) status"""
         if len(status) == 0:
             return []
+        if (status, object) not in self._ids_with_statuses:
+            self._ids_with_statuses[status, object] = self._find_ids_with_statuses(status, object)
+        return self._ids_with_statuses[status, object]
+
+    def _find_ids_with_statuses(self, status, object):
         if object == "harvester":
             status_map = {
                 "working": ["optimal", "suboptimal"],
@@ -97,71 +159,46 @@ class GoBotWrapper:
             statuses.append(status_map[self.DATABASE[f"{object}s"][str_id]])
         return statuses
 
-    def _fill_in_particular_status(self, response, ids, template_to_fill, object="harvester"):
-        """Replaces `template_to_fill` (e.g. `full_ids`) in templated response to objects with given `ids`"""
-        template_to_fill = "{" + template_to_fill + "}"
-        if len(ids) == 0:
-            response = response.replace(f"{object} {template_to_fill} is", "none is")
-        elif len(ids) == 1:
-            response = response.replace(f"{template_to_fill}", str(ids[0]))
-        else:
-            response = response.replace(f"{object} {template_to_fill} is", f"{object}s {', '.join(ids)} are")
-        return response
-
-    def _fill_harvesters_status_templates(self, response, slots):
-        """Fill all variables in the templated response"""
-        full_ids = self._get_ids_with_statuses("full")
-        working_ids = self._get_ids_with_statuses("working")
-        broken_ids = self._get_ids_with_statuses("stall")
-        inactive_ids = self._get_ids_with_statuses("inactive")
-
-        available_rovers_ids = self._get_ids_with_statuses("available", object="rover")
-        inactive_rovers_ids = self._get_ids_with_statuses("inactive", object="rover")
-        broken_rovers_ids = self._get_ids_with_statuses("stall", object="rover")
-
-        response = response.replace("total_harvesters_number", str(len(self.DATABASE["harvesters"])))
-
-        response = self._fill_in_particular_status(response, full_ids, "full_ids", "harvester")
-        response = self._fill_in_particular_status(response, working_ids, "working_ids", "harvester")
-        response = self._fill_in_particular_status(response, broken_ids, "broken_ids", "harvester")
-        response = self._fill_in_particular_status(response, inactive_ids, "inactive_ids", "harvester")
-
-        response = self._fill_in_particular_status(response, available_rovers_ids, "available_rover_ids", "rover")
-        response = self._fill_in_particular_status(response, inactive_rovers_ids, "inactive_rover_ids", "rover")
-        response = self._fill_in_particular_status(response, broken_rovers_ids, "broken_rover_ids", "rover")
-
-        if len(available_rovers_ids) == 1:
-            avail_rover_id = available_rovers_ids[0]
-        elif len(available_rovers_ids) > 1:
-            avail_rover_id = random.choice(available_rovers_ids)
-        response = response.replace("rover_for_trip_id", f"{avail_rover_id}")
+    def _fill_harvesters_status_templates(self, template, slots):
+        """Fill variables referenced in the parsed template"""
+        values = {}
+        for slot in template.slots:
+            if slot in LIST_SLOTS:
+                object, status = LIST_SLOTS[slot]
+                values[slot] = self._get_ids_with_statuses(status, object)
+            elif slot == "total_harvesters_number":
+                values[slot] = str(len(self.DATABASE["harvesters"]))
+            elif slot == "rover_for_trip_id":
+                rover_ids = self._get_ids_with_statuses("available", object="rover")
+                if len(rover_ids) == 0:
+                    # the policy may choose the trip without available rovers
+                    return self.parsed_templates["utter_trip_request_failed"].fill({})
+                values[slot] = random.choice(rover_ids)
 
         logger.info(f"slots: {slots}")
-        print("slots: ", slots, flush=True)
-        if "_id" in response:
-            # re.search(r"[0-9]+", request_text)
+        if "harvester_id" in template.slots:
             required_id = slots.get("number")
-            print(required_id)
             if required_id is not None:
                 required_id = required_id[0]
             if required_id is not None and required_id in self.DATABASE["harvesters"]:
-                status = self._get_statuses_with_ids([required_id])[0]
-                response = response.replace("harvester_id", required_id)
-                response = response.replace("harvester_status", status)
+                values["harvester_id"] = required_id
+                values["harvester_status"] = self._get_statuses_with_ids([required_id])[0]
             else:
-                response = (
+                return (
                     f"I can answer only about the following harvesters ids: "
                     f"{', '.join(self.DATABASE['harvesters'].keys())}."
                 )
+        elif "harvester_status" in template.slots:
+            values["harvester_status"] = "harvester_status"
 
-        response = response.replace("{", "").replace("}", "")
-        return response
+        return template.fill(values)
 
-    def _generate_response_from_storage(self, response, slots):
+    def _generate_response_from_storage(self, template, slots):
         if time.time() - self.PREV_UPDATE_TIME >= 3600:
             self.DATABASE, self.PREV_UPDATE_TIME = self._update_database()
+            self._ids_with_statuses = {}
 
-        response = self._fill_harvesters_status_templates(response, slots)
+        response = self._fill_harvesters_status_templates(template, slots)
 
         return response
 
@@ -173,8 +210,9 @@ gobot = GoBotWrapper("dp_minimal_demo_dir")
 
 @app.route("/reset", methods=["GET"])
 def reset():
-    logger.info("resetting the gobot")
-    gobot.reset()
+    dialog_id = request.args.get("dialog_id")
+    logger.info(f"resetting the gobot for {dialog_id or 'all dialogs'}")
+    gobot.reset(dialog_id)
     return ("", 204)
 
 
@@ -184,8 +222,8 @@ def respond():
 
     dialogs = request.json["dialogs"]
 
-    responses = []
-    confidences = []
+    sentences = []
+    dialog_ids = []
 
     for dialog in dialogs:
         sentence = dialog["human_utterances"][-1]["annotations"].get("spelling_preprocessing")
@@ -194,10 +232,13 @@ def respond():
             logger.warning("Not found spelling preprocessing annotation")
             sentence = dialog["human_utterances"][-1]["text"]
 
-        uttr_resp, conf = gobot(sentence)
-        response = gobot.getNlg(uttr_resp)
+        sentences.append(sentence)
+        dialog_ids.append(dialog.get("dialog_id", dialog.get("id")))
 
-        responses.append(response)
+    responses = []
+    confidences = []
+    for uttr_resp, conf in gobot(sentences, dialog_ids):
+        responses.append(gobot.getNlg(uttr_resp))
         confidences.append(conf)
 
     total_time = time.time() - st_time
@@ -206,5 +247,5 @@ def respond():
 
 
 if __name__ == "__main__":
-    reset()
+    gobot.reset()
     app.run(debug=False, host="0.0.0.0", port=3000)
@@ -0,0 +1,78 @@
+import unittest
+
+import numpy as np
+from deeppavlov import build_model
+from deeppavlov.core.common.file import read_json
+
+from batched_gobot import BatchedGoBot
+from tracker_pool import TrackerPool
+
+DIALOGS = [
+    ["start", "what is the harvesters status", "what is 2 harvester status", "prepare a rover for the trip"],
+    ["start", "rover available?", "lets have a trip with a vehicle"],
+    ["start", "which harvesters require repairs", "show me full harvesters", "rover needs repairs?", "bye"],
+    ["hello"],
+]
+
+
+def response_summary(response):
+    return response.actions_tuple, response.policy_prediction.predicted_action_ix
+
+
+def tracker_summary(tracker):
+    return tracker.get_state(), tracker.prev_action.tolist()
+
+
+class TestBatchedGoBot(unittest.TestCase):
+    @classmethod
+    def setUpClass(cls):
+        # run from the skill directory, like the server
+        cls.go_bot = build_model(read_json("dp_minimal_demo_dir/gobot_config.json")).pipe[-1][-1]
+        cls.trackers = TrackerPool(cls.go_bot.dialogue_state_tracker)
+        cls.go_bot.multiple_user_state_tracker = cls.trackers
+        cls.batched_gobot = BatchedGoBot(cls.go_bot)
+
+    def assert_same_turn(self, text, batched, sequential, batched_id, sequential_id):
+        batched_responses, nlu_response = batched
+        self.assertEqual(
+            [response_summary(response) for response in batched_responses],
+            [response_summary(response) for response in sequential],
+        )
+        for batched_response, sequential_response in zip(batched_responses, sequential):
+            np.testing.assert_allclose(
+                batched_response.policy_prediction.probs, sequential_response.policy_prediction.probs, atol=1e-5
+            )
+        batched_tracker = self.trackers.get_user_tracker(batched_id)
+        sequential_tracker = self.trackers.get_user_tracker(sequential_id)
+        self.assertEqual(tracker_summary(batched_tracker), tracker_summary(sequential_tracker))
+        for batched_state, sequential_state in zip(batched_tracker.network_state, sequential_tracker.network_state):
+            np.testing.assert_allclose(batched_state, sequential_state, atol=1e-5)
+        # slots of the NLU responses returned with the responses are the ones GoBot extracts
+        self.assertEqual(nlu_response.slots, self.go_bot.nlu_manager.nlu(text).slots)
+
+    def test_dialogs_in_one_batch(self):
+        for turn in range(max(len(dialog) for dialog in DIALOGS)):
+            dialog_ids = [i for i, dialog in enumerate(DIALOGS) if turn < len(dialog)]
+            texts = [DIALOGS[i][turn] for i in dialog_ids]
+            batched = self.batched_gobot(texts, [f"batched-{i}" for i in dialog_ids])
+            for i, text, result in zip(dialog_ids, texts, batched):
+                (sequential,) = self.go_bot([text], [f"sequential-{i}"])
+                self.assert_same_turn(text, result, sequential, f"batched-{i}", f"sequential-{i}")
+
+    def test_utterances_of_one_dialog_in_one_batch(self):
+        dialog = DIALOGS[0]
+        batched = self.batched_gobot(dialog, ["batched"] * len(dialog))
+        for text, result in zip(dialog, batched):
+            (sequential,) = self.go_bot([text], ["sequential"])
+            self.assertEqual(
+                [response_summary(response) for response in result[0]],
+                [response_summary(response) for response in sequential],
+            )
+        self.assertEqual(
+            tracker_summary(self.trackers.get_user_tracker("batched")),
+            tracker_summary(self.trackers.get_user_tracker("sequential")),
+        )
+
+
+if __name__ == "__main__":
+    unittest.main()
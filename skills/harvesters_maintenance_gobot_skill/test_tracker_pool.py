@@ -0,0 +1,71 @@
+import os
+import tempfile
+import unittest
+
+import numpy as np
+from deeppavlov.models.go_bot.nlu.dto.nlu_response import NLUResponse
+from deeppavlov.models.go_bot.tracker.dialogue_state_tracker import DialogueStateTracker
+
+from tracker_pool import TrackerPool
+
+
+def make_turn(tracker, number, action):
+    tracker.update_state(NLUResponse({"number": number}, [], ["harvester", number]))
+    tracker.update_previous_action(action)
+    tracker.network_state = tuple(np.full([1, tracker.hidden_size], action, dtype=np.float32) for _ in range(2))
+
+
+def tracker_state(tracker):
+    return tracker.get_state(), tracker.prev_action.tolist(), [state.tolist() for state in tracker.network_state]
+
+
+class TestTrackerPool(unittest.TestCase):
+    def setUp(self):
+        self.tmp_dir = tempfile.TemporaryDirectory()
+        self.store_path = os.path.join(self.tmp_dir.name, "trackers.sqlite")
+        self.base_tracker = DialogueStateTracker(["number"], n_actions=5, api_call_id=4, hidden_size=3)
+
+    def tearDown(self):
+        self.tmp_dir.cleanup()
+
+    def test_state_is_restored_after_eviction(self):
+        pool = TrackerPool(self.base_tracker, max_size=1, store_path=self.store_path)
+        make_turn(pool.get_or_init_tracker("dialog_1"), "3", 2)
+        pool.save("dialog_1")
+        expected = tracker_state(pool.get_user_tracker("dialog_1"))
+
+        make_turn(pool.get_or_init_tracker("dialog_2"), "7", 1)
+        pool.save("dialog_2")
+        # only one tracker is kept in memory
+        self.assertEqual(len(pool), 1)
+        self.assertNotIn("dialog_1", pool._ids_to_trackers)
+
+        self.assertEqual(tracker_state(pool.get_or_init_tracker("dialog_1")), expected)
+        self.assertEqual(pool.get_or_init_tracker("dialog_1").get_state(), {"number": "3"})
+
+    def test_state_is_shared_by_workers(self):
+        pool, other_pool = (TrackerPool(self.base_tracker, store_path=self.store_path) for _ in range(2))
+        make_turn(pool.get_or_init_tracker("dialog"), "3", 2)
+        pool.save("dialog")
+        expected = tracker_state(pool.get_user_tracker("dialog"))
+        self.assertEqual(tracker_state(other_pool.get_or_init_tracker("dialog")), expected)
+
+        # the next turn is made by the other worker
+        make_turn(other_pool.get_or_init_tracker("dialog"), "5", 3)
+        other_pool.save("dialog")
+        self.assertEqual(pool.get_or_init_tracker("dialog").get_state(), {"number": "5"})
+
+        other_pool.reset("dialog")
+        self.assertEqual(pool.get_or_init_tracker("dialog").get_state(), {})
+
+    def test_without_store(self):
+        pool = TrackerPool(self.base_tracker, max_size=1)
+        make_turn(pool.get_or_init_tracker("dialog_1"), "3", 2)
+        pool.save("dialog_1")
+        pool.get_or_init_tracker("dialog_2")
+        # evicted dialogs start anew without the store
+        self.assertEqual(pool.get_or_init_tracker("dialog_1").get_state(), {})
+
+
+if __name__ == "__main__":
+    unittest.main()
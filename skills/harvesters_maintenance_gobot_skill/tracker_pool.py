@@ -0,0 +1,168 @@
+import pickle
+import sqlite3
+import threading
+import time
+from collections import OrderedDict
+from pathlib import Path
+from typing import Optional
+
+from deeppavlov.models.go_bot.tracker.dialogue_state_tracker import (
+    DialogueStateTracker,
+    MultipleUserStateTrackersPool,
+)
+
+# the database component is shared by all trackers and is not saved with their states
+NOT_SAVED_ATTRIBUTES = {"database"}
+
+
+class TrackerPool(MultipleUserStateTrackersPool):
+    """
+    Dialogue state trackers of GoBot kept per dialog id in a bounded LRU,
+    trackers idle for more than `idle_timeout` seconds are evicted.
+
+    If `store_path` is set, states of trackers are written to SQLite after every turn (`save`)
+    and read from it when a tracker is missing in memory or was updated by another worker,
+    so dialogs outlive the eviction and are shared by all workers of the host.
+
+    Args:
+        base_tracker: tracker of GoBot new trackers are created like
+        max_size: max number of trackers in memory
+        idle_timeout: seconds after the last access to evict a tracker from memory
+        store_path: path to the SQLite file of tracker states
+        store_ttl: seconds after the last turn to delete a state from the store
+    """
+
+    PURGE_EVERY = 1000
+
+    def __init__(
+        self,
+        base_tracker: DialogueStateTracker,
+        max_size: int = 10000,
+        idle_timeout: float = 3600,
+        store_path: Optional[str] = None,
+        store_ttl: float = 86400,
+    ):
+        super().__init__(base_tracker)
+        self.max_size = max_size
+        self.idle_timeout = idle_timeout
+        self.store_ttl = store_ttl
+        self._n_saved = 0
+        self._ids_to_trackers = OrderedDict()
+        self._last_access = {}
+        # versions of states in the store the trackers in memory correspond to
+        self._versions = {}
+        self._lock = threading.RLock()
+        self._conn = None
+        if store_path:
+            Path(store_path).parent.mkdir(parents=True, exist_ok=True)
+            self._conn = sqlite3.connect(store_path, timeout=10, check_same_thread=False)
+            self._conn.execute("PRAGMA journal_mode=WAL")
+            self._conn.execute(
+                "CREATE TABLE IF NOT EXISTS trackers (id TEXT PRIMARY KEY, version INTEGER, state BLOB, updated REAL)"
+            )
+            self._conn.commit()
+
+    def _evict(self):
+        deadline = time.time() - self.idle_timeout
+        # trackers are ordered by the last access, so the idle ones are at the start
+        while self._ids_to_trackers:
+            user_id = next(iter(self._ids_to_trackers))
+            if len(self._ids_to_trackers) <= self.max_size and self._last_access[user_id] >= deadline:
+                break
+            self._forget(user_id)
+
+    def _forget(self, user_id):
+        self._ids_to_trackers.pop(user_id, None)
+        self._last_access.pop(user_id, None)
+        self._versions.pop(user_id, None)
+
+    def _load(self, user_id) -> bool:
+        """Loads the state of the tracker from the store if it is newer than the one in memory"""
+        row = self._conn.execute("SELECT version FROM trackers WHERE id = ?", (str(user_id),)).fetchone()
+        if row is None and user_id in self._versions:
+            # the saved dialog was reset by another worker
+            self._forget(user_id)
+        if row is None or (row[0] == self._versions.get(user_id) and user_id in self._ids_to_trackers):
+            return False
+        (state,) = self._conn.execute("SELECT state FROM trackers WHERE id = ?", (str(user_id),)).fetchone()
+        tracker = self.new_tracker()
+        tracker.__dict__.update(pickle.loads(state))
+        self._ids_to_trackers[user_id] = tracker
+        self._versions[user_id] = row[0]
+        return True
+
+    def _touch(self, user_id):
+        self._ids_to_trackers.move_to_end(user_id)
+        self._last_access[user_id] = time.time()
+        self._evict()
+
+    def check_new_user(self, user_id) -> bool:
+        with self._lock:
+            if self._conn is not None:
+                self._load(user_id)
+            return user_id in self._ids_to_trackers
+
+    def get_user_tracker(self, user_id) -> DialogueStateTracker:
+        with self._lock:
+            tracker = super().get_user_tracker(user_id)
+            self._touch(user_id)
+            return tracker
+
+    def get_or_init_tracker(self, user_id) -> DialogueStateTracker:
+        with self._lock:
+            if not self.check_new_user(user_id):
+                self.init_new_tracker(user_id, self.base_tracker)
+            tracker = self._ids_to_trackers[user_id]
+            tracker.current_db_result = None
+            self._touch(user_id)
+            return tracker
+
+    def init_new_tracker(self, user_id, tracker_entity: DialogueStateTracker) -> None:
+        with self._lock:
+            super().init_new_tracker(user_id, tracker_entity)
+            self._last_access[user_id] = time.time()
+            self._versions.pop(user_id, None)
+
+    def save(self, user_id) -> None:
+        """Writes the state of the tracker to the store after a turn of the dialog"""
+        if self._conn is None:
+            return
+        with self._lock:
+            tracker = self._ids_to_trackers.get(user_id)
+            if tracker is None:
+                return
+            state = {key: value for key, value in tracker.__dict__.items() if key not in NOT_SAVED_ATTRIBUTES}
+            version = self._versions.get(user_id, 0) + 1
+            self._conn.execute(
+                "INSERT OR REPLACE INTO trackers VALUES (?, ?, ?, ?)",
+                (str(user_id), version, pickle.dumps(state, pickle.HIGHEST_PROTOCOL), time.time()),
+            )
+            self._n_saved += 1
+            if self._n_saved % self.PURGE_EVERY == 0:
+                self._conn.execute("DELETE FROM trackers WHERE updated < ?", (time.time() - self.store_ttl,))
+            self._conn.commit()
+            self._versions[user_id] = version
+
+    def discard(self, user_id) -> None:
+        """Drops the tracker of the dialog from memory, its state in the store is kept"""
+        with self._lock:
+            self._forget(user_id)
+
+    def reset(self, user_id=None) -> None:
+        """Drops the tracker of the dialog, all trackers if `user_id` is None"""
+        with self._lock:
+            if user_id is None:
+                self._ids_to_trackers.clear()
+                self._last_access.clear()
+                self._versions.clear()
+            else:
+                self._forget(user_id)
+            if self._conn is not None:
+                if user_id is None:
+                    self._conn.execute("DELETE FROM trackers")
+                else:
+                    self._conn.execute("DELETE FROM trackers WHERE id = ?", (str(user_id),))
+                self._conn.commit()
+
+    def __len__(self):
+        return len(self._ids_to_trackers)
@@ -0,0 +1,74 @@
+import re
+
+REQUESTS = {
+    "all_statuses_request": [
+        # r"(what|which) (is|are)( the)? (harvesters|combines) status(es)?",
+        r"(harvesters|combines) status(es)?",
+        r"status(es)?[a-z ]* (harvesters|combines)",
+    ],
+    "status_request": [
+        # r"(what|which) is( the| a)? [0-9]+ (harvester|combine) status",
+        r"[0-9]+ (harvester|combine) status",
+        r"(harvester|combine) [0-9]+ status",
+        r"status [a-z ]*[0-9]+ (harvester|combine)",
+        r"status [a-z ]*(harvester|combine) [0-9]+",
+    ],
+    "broken_ids_request": [
+        r"(harvester|combine)s? require(s|ing)? repairs?",
+        r"(harvester|combine)s? [a-z ]*(broken|stall)",
+        r"(broken|stall) (harvester|combine)s?",
+    ],
+    "full_ids_request": [r"(harvester|combine)s? [a-z ]*full", r"full (harvester|combine)s?"],
+    "working_ids_request": [r"(harvester|combine)s? [a-z ]*work(ing|s)?", r"work(ing|s)? (harvester|combine)s?"],
+    "inactive_ids_request": [r"(harvester|combine)s? [a-z ]*inactive", r"inactive (harvester|combine)s?"],
+    "available_rover_ids_request": [
+        r"(rover|vehicle)s? [a-z ]*(work(ing|s)?|available)",
+        r"(work(ing|s)?|available) (rover|vehicle)s?",
+    ],
+    "broken_rover_ids_request": [
+        r"(rover|vehicle)s? require(s|ing)? repairs?",
+        r"(rover|vehicle)s? [a-z ]*(broken|stall)" r"(broken|stall) (rover|vehicle)s?",
+    ],
+    "inactive_rover_ids_request": [r"(rover|vehicle)s? [a-z ]*inactive", r"inactive (rover|vehicle)s?"],
+    "trip_request": [
+        # r"(want|need|prepare) (rover|vehicle) for( a| the| my)? trip",
+        # r"(lets|let us|let's) have( a| the)? trip"
+        r"(rover|vehicle) [a-z ]*trip",
+        r"trip [a-z ]*(rover|vehicle)",
+    ],
+}
+COMPILED_REQUESTS = {
+    intent: [re.compile(template, re.IGNORECASE) for template in templates] for intent, templates in REQUESTS.items()
+}
+
+# Every template requires one of the objects it mentions, so only templates mentioning an object found
+# in the utterance can match it and utterances without any object are not relevant without any further search.
+ANCHORS = re.compile(r"harvester|combine|rover|vehicle", re.IGNORECASE)
+# all templates in the order of REQUESTS and positions of the templates mentioning every object
+TEMPLATES = [(intent, template) for intent, templates in COMPILED_REQUESTS.items() for template in templates]
+ANCHOR_TEMPLATES = {
+    anchor: {i for i, (_, template) in enumerate(TEMPLATES) if anchor in ANCHORS.findall(template.pattern)}
+    for anchor in ["harvester", "combine", "rover", "vehicle"]
+}
+
+
+def detect_intent_sequential(utterance):
+    """Detecting intents with regexp templates one by one, reference for `detect_intent`"""
+    for intent in COMPILED_REQUESTS:
+        for template in COMPILED_REQUESTS[intent]:
+            if re.search(template, utterance):
+                return intent
+    return "not_relevant"
+
+
+def detect_intent(utterance):
+    """Detecting intents with the regexp templates mentioning objects of the utterance only"""
+    candidates = set()
+    for anchor in {anchor.lower() for anchor in ANCHORS.findall(utterance)}:
+        candidates |= ANCHOR_TEMPLATES[anchor]
+    # templates are searched in the order of REQUESTS, so the first intent with a template found wins
+    for i in sorted(candidates):
+        intent, template = TEMPLATES[i]
+        if template.search(utterance):
+            return intent
+    return "not_relevant"
@@ -4,12 +4,16 @@ import logging
 import time
 import random
 import re
-import json
+from functools import lru_cache
 
 from flask import Flask, request, jsonify
 from os import getenv
 import sentry_sdk
 
+from intents import detect_intent
+from response_templates import ResponseTemplate
+from status_store import StatusStore
+
 
 sentry_sdk.init(getenv("SENTRY_DSN"))
 
@@ -18,46 +22,6 @@ logger = logging.getLogger(__name__)
 
 app = Flask(__name__)
 
-REQUESTS = {
-    "all_statuses_request": [
-        # r"(what|which) (is|are)( the)? (harvesters|combines) status(es)?",
-        r"(harvesters|combines) status(es)?",
-        r"status(es)?[a-z ]* (harvesters|combines)",
-    ],
-    "status_request": [
-        # r"(what|which) is( the| a)? [0-9]+ (harvester|combine) status",
-        r"[0-9]+ (harvester|combine) status",
-        r"(harvester|combine) [0-9]+ status",
-        r"status [a-z ]*[0-9]+ (harvester|combine)",
-        r"status [a-z ]*(harvester|combine) [0-9]+",
-    ],
-    "broken_ids_request": [
-        r"(harvester|combine)s? require(s|ing)? repairs?",
-        r"(harvester|combine)s? [a-z ]*(broken|stall)",
-        r"(broken|stall) (harvester|combine)s?",
-    ],
-    "full_ids_request": [r"(harvester|combine)s? [a-z ]*full", r"full (harvester|combine)s?"],
-    "working_ids_request": [r"(harvester|combine)s? [a-z ]*work(ing|s)?", r"work(ing|s)? (harvester|combine)s?"],
-    "inactive_ids_request": [r"(harvester|combine)s? [a-z ]*inactive", r"inactive (harvester|combine)s?"],
-    "available_rover_ids_request": [
-        r"(rover|vehicle)s? [a-z ]*(work(ing|s)?|available)",
-        r"(work(ing|s)?|available) (rover|vehicle)s?",
-    ],
-    "broken_rover_ids_request": [
-        r"(rover|vehicle)s? require(s|ing)? repairs?",
-        r"(rover|vehicle)s? [a-z ]*(broken|stall)" r"(broken|stall) (rover|vehicle)s?",
-    ],
-    "inactive_rover_ids_request": [r"(rover|vehicle)s? [a-z ]*inactive", r"inactive (rover|vehicle)s?"],
-    "trip_request": [
-        # r"(want|need|prepare) (rover|vehicle) for( a| the| my)? trip",
-        # r"(lets|let us|let's) have( a| the)? trip"
-        r"(rover|vehicle) [a-z ]*trip",
-        r"trip [a-z ]*(rover|vehicle)",
-    ],
-}
-for intent in REQUESTS:
-    REQUESTS[intent] = [re.compile(template, re.IGNORECASE) for template in REQUESTS[intent]]
-
 RESPONSES = {
     "all_statuses_request": [
         "Of TOTAL_N_HARVESTERS harvesters, harvester FULL_IDS is full, harvester WORKING_IDS is working,"
@@ -108,127 +72,85 @@ RESPONSES = {
 }
 
 
-def update_database():
-    """Update database loading new version every our"""
-    with open("harvesters_status.json", "r") as f:
-        db = json.load(f)
-    return db, time.time()
-
-
-DATABASE, PREV_UPDATE_TIME = update_database()
-
-
-def detect_intent(utterance):
-    """Detecting intents with regexp templates"""
-    for intent in REQUESTS:
-        for template in REQUESTS[intent]:
-            if re.search(template, utterance):
-                return intent
-    return "not_relevant"
+# harvesters statuses are out of ["full", "working", "stall", "inactive"]
+STATUS_MAPS = {"harvesters": {"optimal": "working", "suboptimal": "working"}}
+STATUS_POLL_INTERVAL = float(getenv("STATUS_POLL_INTERVAL", 5))
 
+DATABASE = StatusStore("harvesters_status.json", STATUS_MAPS, poll_interval=STATUS_POLL_INTERVAL)
 
-def get_ids_with_statuses(status, object="harvester"):
-    """Return ids of objects with given (inner) status"""
-    if len(status) == 0:
-        return []
-    if object == "harvester":
-        status_map = {
-            "working": ["optimal", "suboptimal"],
-            "full": ["full"],
-            "stall": ["stall"],
-            "inactive": ["inactive"],
-        }
-        statuses = status_map[status]
-    else:
-        statuses = [status]
-
-    ids = []
-    for str_id in DATABASE[f"{object}s"]:
-        if DATABASE[f"{object}s"][str_id] in statuses:
-            ids.append(str_id)
-    return ids
-
-
-def get_statuses_with_ids(ids, object="harvester"):
-    """Return (inner) statuses of objects with given ids"""
-    # harvesters statuses are out of ["full", "working", "stall", "inactive"]
-    if object == "harvester":
-        status_map = {
-            "optimal": "working",
-            "suboptimal": "working",
-            "full": "full",
-            "stall": "stall",
-            "inactive": "inactive",
-        }
-    else:
-        status_map = {"available": "available", "stall": "stall", "inactive": "inactive"}
 
-    statuses = []
-    for str_id in ids:
-        statuses.append(status_map[DATABASE[f"{object}s"][str_id]])
-    return statuses
-
-
-def fill_in_particular_status(response, ids, template_to_fill, object="harvester"):
-    """Replaces `template_to_fill` (e.g. `FULL_IDS`) in templated response to objects with given `ids`"""
-    if len(ids) == 0:
-        response = response.replace(f"{object} {template_to_fill} is", "none is")
-    elif len(ids) == 1:
-        response = response.replace(f"{template_to_fill}", str(ids[0]))
-    else:
-        response = response.replace(f"{object} {template_to_fill} is", f"{object}s {', '.join(ids)} are")
-    return response
+# list slots of templates with (object, inner status) of their ids
+LIST_SLOTS = {
+    "FULL_IDS": ("harvester", "full"),
+    "WORKING_IDS": ("harvester", "working"),
+    "BROKEN_IDS": ("harvester", "stall"),
+    "INACTIVE_IDS": ("harvester", "inactive"),
+    "AVAILABLE_ROVER_IDS": ("rover", "available"),
+    "INACTIVE_ROVER_IDS": ("rover", "inactive"),
+    "BROKEN_ROVER_IDS": ("rover", "stall"),
+}
+VALUE_SLOTS = ["TOTAL_N_HARVESTERS", "ROVER_FOR_TRIP_ID", "ID", "STATUS"]
 
 
-def fill_harvesters_status_templates(response, request_text):
-    """Fill all variables in the templated response"""
-    full_ids = get_ids_with_statuses("full")
-    working_ids = get_ids_with_statuses("working")
-    broken_ids = get_ids_with_statuses("stall")
-    inactive_ids = get_ids_with_statuses("inactive")
+@lru_cache(maxsize=None)
+def get_template(response):
+    return ResponseTemplate(response, {slot: object for slot, (object, _) in LIST_SLOTS.items()}, VALUE_SLOTS)
 
-    available_rovers_ids = get_ids_with_statuses("available", object="rover")
-    inactive_rovers_ids = get_ids_with_statuses("inactive", object="rover")
-    broken_rovers_ids = get_ids_with_statuses("stall", object="rover")
 
-    response = response.replace("TOTAL_N_HARVESTERS", str(len(DATABASE["harvesters"])))
+# templates of all responses are parsed on start
+for responses_collection in RESPONSES.values():
+    if isinstance(responses_collection, dict):
+        responses_collection = [responses_collection["yes"], responses_collection["no"]]
+    for response in responses_collection:
+        get_template(response)
 
-    response = fill_in_particular_status(response, full_ids, "FULL_IDS", "harvester")
-    response = fill_in_particular_status(response, working_ids, "WORKING_IDS", "harvester")
-    response = fill_in_particular_status(response, broken_ids, "BROKEN_IDS", "harvester")
-    response = fill_in_particular_status(response, inactive_ids, "INACTIVE_IDS", "harvester")
 
-    response = fill_in_particular_status(response, available_rovers_ids, "AVAILABLE_ROVER_IDS", "rover")
-    response = fill_in_particular_status(response, inactive_rovers_ids, "INACTIVE_ROVER_IDS", "rover")
-    response = fill_in_particular_status(response, broken_rovers_ids, "BROKEN_ROVER_IDS", "rover")
+def get_ids_with_statuses(snapshot, status, object="harvester"):
+    """Return ids of objects with given (inner) status, lists are made once per version of the database"""
+    if len(status) == 0:
+        return ()
+    return snapshot.get_ids(f"{object}s", status)
 
-    if len(available_rovers_ids) == 1:
-        avail_rover_id = available_rovers_ids[0]
-    elif len(available_rovers_ids) > 1:
-        avail_rover_id = random.choice(available_rovers_ids)
-    response = response.replace("ROVER_FOR_TRIP_ID", f"{avail_rover_id}")
 
-    if "ID" in response:
+def get_statuses_with_ids(snapshot, ids, object="harvester"):
+    """Return (inner) statuses of objects with given ids"""
+    return [snapshot.get_status(f"{object}s", str_id) for str_id in ids]
+
+
+def fill_harvesters_status_templates(response, request_text, snapshot):
+    """Fill variables referenced in the templated response"""
+    template = get_template(response)
+    values = {}
+    for slot in template.slots:
+        if slot in LIST_SLOTS:
+            object, status = LIST_SLOTS[slot]
+            values[slot] = get_ids_with_statuses(snapshot, status, object)
+        elif slot == "TOTAL_N_HARVESTERS":
+            values[slot] = str(len(snapshot.get_all_ids("harvesters")))
+        elif slot == "ROVER_FOR_TRIP_ID":
+            values[slot] = random.choice(get_ids_with_statuses(snapshot, "available", object="rover"))
+
+    if "ID" in template.slots:
         required_id = re.search(r"[0-9]+", request_text)
         if required_id:
             required_id = required_id[0]
-        if required_id and required_id in DATABASE["harvesters"]:
-            status = get_statuses_with_ids([required_id])[0]
-            response = response.replace("ID", required_id)
-            response = response.replace("STATUS", status)
+        if required_id and snapshot.get_status("harvesters", required_id) is not None:
+            values["ID"] = required_id
+            values["STATUS"] = get_statuses_with_ids(snapshot, [required_id])[0]
         else:
-            response = (
-                f"I can answer only about the following harvesters ids: " f"{', '.join(DATABASE['harvesters'].keys())}."
+            return (
+                f"I can answer only about the following harvesters ids: "
+                f"{', '.join(snapshot.get_all_ids('harvesters'))}."
             )
+    elif "STATUS" in template.slots:
+        values["STATUS"] = "STATUS"
 
-    return response
+    return template.fill(values)
 
 
 def generate_response_from_db(intent, utterance):
-    global PREV_UPDATE_TIME
-    if time.time() - PREV_UPDATE_TIME >= 3600:
-        DATABASE, PREV_UPDATE_TIME = update_database()
-
+    # the yes/no choice and the filled template are of the same version of the database
+    snapshot = DATABASE.snapshot()
     response = ""
     responses_collection = RESPONSES[intent]
     if isinstance(responses_collection, list):
@@ -237,16 +159,16 @@ def generate_response_from_db(intent, utterance):
         required_statuses = responses_collection.get("required", {}).get("harvesters", "")
         if len(required_statuses) == 0:
             required_statuses = responses_collection.get("required", {}).get("rovers", "")
-            ids = get_ids_with_statuses(required_statuses, object="rover")
+            ids = get_ids_with_statuses(snapshot, required_statuses, object="rover")
         else:
-            ids = get_ids_with_statuses(required_statuses, object="harvester")
+            ids = get_ids_with_statuses(snapshot, required_statuses, object="harvester")
 
         if len(required_statuses) == 0 or (len(required_statuses) > 0 and len(ids) > 0):
             response = responses_collection["yes"]
         else:
             response = responses_collection["no"]
 
-    response = fill_harvesters_status_templates(response, utterance)
+    response = fill_harvesters_status_templates(response, utterance, snapshot)
 
     if intent == "not_relevant":
         confidence = 0.5
@@ -0,0 +1,152 @@
+import json
+import logging
+import os
+import threading
+from typing import Callable, Dict, List, Optional, Tuple
+
+logger = logging.getLogger(__name__)
+
+
+class StatusSnapshot:
+    """Statuses and ids of one version of the store, later reloads do not change them"""
+
+    def __init__(self, version: int, statuses: Dict[str, Dict[str, str]], ids: Dict[str, Dict[str, Tuple[str, ...]]]):
+        self.version = version
+        self._statuses = statuses
+        self._ids = ids
+
+    def get_ids(self, objects: str, status: str) -> Tuple[str, ...]:
+        return self._ids.get(objects, {}).get(status, ())
+
+    def get_status(self, objects: str, id: str) -> Optional[str]:
+        return self._statuses.get(objects, {}).get(id)
+
+    def get_all_ids(self, objects: str) -> Tuple[str, ...]:
+        return tuple(self._statuses.get(objects, {}))
+
+
+class StatusStore:
+    """
+    Statuses of objects (`harvesters`, `rovers`) from the status file with inverted indexes
+    status -> ids and id -> status for every kind of objects.
+
+    The file is polled for mtime changes in a background thread. On change only the id lists of statuses
+    some object left or entered are rebuilt, `version` is increased and listeners are called with the new version.
+    Answers made of several reads should take them from one `snapshot()`, so they are of the same version.
+
+    Args:
+        path: path to the json file with `{objects: {id: status}}` dicts
+        status_maps: `{objects: {status: inner status}}`, statuses missing in the map are kept as is
+        poll_interval: seconds between mtime checks, the file is not polled if 0
+    """
+
+    def __init__(self, path: str, status_maps: Optional[Dict[str, Dict[str, str]]] = None, poll_interval: float = 5.0):
+        self.path = path
+        self.status_maps = status_maps or {}
+        self.version = 0
+        self._mtime = None
+        self._statuses: Dict[str, Dict[str, str]] = {}
+        # ids of a status are kept in a dict as an ordered set in the order of the file
+        self._ids: Dict[str, Dict[str, Dict[str, None]]] = {}
+        self._listeners: List[Callable[[int], None]] = []
+        self._snapshot = StatusSnapshot(0, {}, {})
+        self._lock = threading.Lock()
+        self._stop = threading.Event()
+        self.reload()
+        if poll_interval:
+            thread = threading.Thread(target=self._poll, args=(poll_interval,), name="status_store_poll", daemon=True)
+            thread.start()
+
+    def _poll(self, interval: float):
+        while not self._stop.wait(interval):
+            try:
+                self.reload()
+            except Exception as e:
+                # e.g. the file is being rewritten, the next poll will load it
+                logger.warning(f"status file {self.path} is not reloaded: {e!r}")
+
+    def reload(self) -> bool:
+        """Reloads the status file if its mtime changed, returns whether statuses changed"""
+        mtime = os.stat(self.path).st_mtime_ns
+        if mtime == self._mtime:
+            return False
+        with open(self.path, "r") as f:
+            db = json.load(f)
+
+        with self._lock:
+            all_objects = set(self._statuses) | {key for key, value in db.items() if isinstance(value, dict)}
+            n_changed = sum(self._update(objects, db.get(objects, {})) for objects in all_objects)
+            self._mtime = mtime
+            if n_changed or not self.version:
+                self.version += 1
+                self._snapshot = self._make_snapshot()
+            version = self.version
+        logger.info(f"status file {self.path} is loaded, {n_changed} statuses changed, version {version}")
+
+        if n_changed:
+            for listener in self._listeners:
+                listener(version)
+        return bool(n_changed)
+
+    def _update(self, objects: str, new_statuses: Dict[str, str]) -> int:
+        status_map = self.status_maps.get(objects, {})
+        new_statuses = {id: status_map.get(status, status) for id, status in new_statuses.items()}
+        statuses = self._statuses.get(objects, {})
+        index = self._ids.setdefault(objects, {})
+
+        removed = [id for id in statuses if id not in new_statuses]
+        changed_statuses = {statuses[id] for id in removed}
+        n_changed = len(removed)
+        for id, status in new_statuses.items():
+            prev_status = statuses.get(id)
+            if prev_status == status:
+                continue
+            if prev_status is not None:
+                changed_statuses.add(prev_status)
+            changed_statuses.add(status)
+            n_changed += 1
+
+        if n_changed:
+            # changed lists are rebuilt, so ids of a status stay in the order of the file
+            for status in changed_statuses:
+                index[status] = {}
+            for id, status in new_statuses.items():
+                if status in changed_statuses:
+                    index[status][id] = None
+            for status in changed_statuses:
+                if not index[status]:
+                    del index[status]
+            self._statuses[objects] = new_statuses
+        return n_changed
+
+    def _make_snapshot(self) -> StatusSnapshot:
+        statuses = {objects: dict(object_statuses) for objects, object_statuses in self._statuses.items()}
+        ids = {
+            objects: {status: tuple(status_ids) for status, status_ids in index.items()}
+            for objects, index in self._ids.items()
+        }
+        return StatusSnapshot(self.version, statuses, ids)
+
+    def snapshot(self) -> StatusSnapshot:
+        """Statuses of the current version, the snapshot is made once per version"""
+        with self._lock:
+            return self._snapshot
+
+    def add_listener(self, callback: Callable[[int], None]):
+        """`callback` is called with the new version after every change of statuses"""
+        self._listeners.append(callback)
+
+    def get_ids(self, objects: str, status: str) -> List[str]:
+        with self._lock:
+            return list(self._ids.get(objects, {}).get(status, {}))
+
+    def get_status(self, objects: str, id: str) -> Optional[str]:
+        with self._lock:
+            return self._statuses.get(objects, {}).get(id)
+
+    def get_all_ids(self, objects: str) -> List[str]:
+        with self._lock:
+            return list(self._statuses.get(objects, {}))
+
+    def close(self):
+        self._stop.set()
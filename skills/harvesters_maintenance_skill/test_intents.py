@@ -0,0 +1,71 @@
+import itertools
+import random
+import unittest
+
+from intents import detect_intent, detect_intent_sequential
+
+UTTERANCES = [
+    "what is the harvesters status",
+    "tell me statuses of all combines",
+    "what is 2 harvester status",
+    "harvester 3 status please",
+    "status of the 4 combine",
+    "status of the harvester 1",
+    "which harvesters require repairs",
+    "are there any broken combines",
+    "combines that stall",
+    "show me full harvesters",
+    "which harvesters are working",
+    "inactive combines",
+    "which rovers are available",
+    "working vehicles",
+    "vehicles requiring repair",
+    "rovers that are broken",
+    "broken rovers",
+    "rover is stall broken rovers",
+    "inactive vehicles",
+    "prepare a rover for the trip",
+    "lets have a trip with a vehicle",
+    "trip",
+    "hello how are you",
+    "",
+    # several intents in one utterance: the first intent of REQUESTS wins, not the leftmost match
+    "broken rovers and harvesters status",
+    "trip on a rover or 3 harvester status",
+    "full harvester\ninactive combine",
+    "HARVESTERS STATUS",
+]
+
+WORDS = [
+    "harvester", "harvesters", "combine", "combines", "rover", "rovers", "vehicle", "vehicles", "status",
+    "statuses", "broken", "stall", "full", "working", "works", "work", "inactive", "available", "trip",
+    "require", "requires", "requiring", "repair", "repairs", "the", "of", "is", "are", "what", "1", "42", "",
+]  # fmt: skip
+SEPARATORS = [" ", " ", " ", "  ", ", ", "\n", "-"]
+
+
+def generate_corpus(n_utterances=20000, seed=0):
+    rng = random.Random(seed)
+    corpus = [" ".join(pair) for pair in itertools.permutations(WORDS, 2)]
+    for _ in range(n_utterances):
+        words = [rng.choice(WORDS) for _ in range(rng.randint(1, 8))]
+        utterance = "".join(word + rng.choice(SEPARATORS) for word in words)
+        corpus.append(utterance.upper() if rng.random() < 0.1 else utterance)
+    return corpus
+
+
+class TestDetectIntent(unittest.TestCase):
+    def test_examples(self):
+        self.assertEqual(detect_intent("what is the harvesters status"), "all_statuses_request")
+        self.assertEqual(detect_intent("harvester 3 status please"), "status_request")
+        self.assertEqual(detect_intent("broken rovers and harvesters status"), "all_statuses_request")
+        self.assertEqual(detect_intent("prepare a rover for the trip"), "trip_request")
+        self.assertEqual(detect_intent("hello how are you"), "not_relevant")
+
+    def test_parity(self):
+        for utterance in UTTERANCES + generate_corpus():
+            self.assertEqual(detect_intent(utterance), detect_intent_sequential(utterance), repr(utterance))
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,103 @@
+import json
+import os
+import shutil
+import tempfile
+import unittest
+
+from status_store import StatusStore
+
+STATUS_MAPS = {"harvesters": {"optimal": "working", "suboptimal": "working"}}
+STATUSES = {
+    "harvesters": {"1": "stall", "2": "optimal", "3": "inactive", "4": "full", "5": "suboptimal"},
+    "rovers": {"1": "inactive", "2": "available", "3": "available", "4": "available"},
+}
+
+
+class StatusStoreTest(unittest.TestCase):
+    def setUp(self):
+        self.dir = tempfile.mkdtemp()
+        self.path = os.path.join(self.dir, "harvesters_status.json")
+        self.mtime = 0
+        self.write(STATUSES)
+        self.store = StatusStore(self.path, STATUS_MAPS, poll_interval=0)
+        self.versions = []
+        self.store.add_listener(self.versions.append)
+
+    def tearDown(self):
+        self.store.close()
+        shutil.rmtree(self.dir)
+
+    def write(self, statuses):
+        with open(self.path, "w") as f:
+            json.dump(statuses, f)
+        # the file may be rewritten within the mtime resolution, so every write gets its own mtime
+        self.mtime += 10 ** 9
+        os.utime(self.path, ns=(self.mtime, self.mtime))
+
+    def update(self, objects, **statuses):
+        db = {key: dict(value) for key, value in STATUSES.items()}
+        db[objects].update(statuses)
+        return db
+
+    def test_load(self):
+        self.assertEqual(self.store.version, 1)
+        self.assertEqual(self.store.get_ids("harvesters", "working"), ["2", "5"])
+        self.assertEqual(self.store.get_ids("rovers", "available"), ["2", "3", "4"])
+        self.assertEqual(self.store.get_ids("rovers", "full"), [])
+        self.assertEqual(self.store.get_status("harvesters", "5"), "working")
+        self.assertIsNone(self.store.get_status("harvesters", "6"))
+        self.assertEqual(self.store.get_all_ids("harvesters"), ["1", "2", "3", "4", "5"])
+
+    def test_reload_keeps_file_order(self):
+        self.write(self.update("rovers", **{"1": "available", "3": "stall"}))
+        self.assertTrue(self.store.reload())
+        self.assertEqual(self.store.get_ids("rovers", "available"), ["1", "2", "4"])
+        self.assertEqual(self.store.get_ids("rovers", "stall"), ["3"])
+        self.assertEqual(self.store.get_ids("rovers", "inactive"), [])
+
+        self.write(STATUSES)
+        self.assertTrue(self.store.reload())
+        self.assertEqual(self.store.get_ids("rovers", "available"), ["2", "3", "4"])
+        self.assertEqual(self.store.get_ids("rovers", "inactive"), ["1"])
+
+    def test_reload_added_and_removed_ids(self):
+        db = self.update("harvesters", **{"0": "optimal"})
+        del db["harvesters"]["2"]
+        db["harvesters"] = {"0": "optimal", **db["harvesters"]}
+        self.write(db)
+        self.assertTrue(self.store.reload())
+        self.assertEqual(self.store.get_ids("harvesters", "working"), ["0", "5"])
+        self.assertIsNone(self.store.get_status("harvesters", "2"))
+        self.assertEqual(self.store.get_all_ids("harvesters"), ["0", "1", "3", "4", "5"])
+
+    def test_version_and_listeners(self):
+        self.assertFalse(self.store.reload())
+        # rewritten file with the same statuses, mapped statuses included, is not a change
+        self.write(self.update("harvesters", **{"2": "suboptimal"}))
+        self.assertFalse(self.store.reload())
+        self.assertEqual(self.store.version, 1)
+        self.assertEqual(self.versions, [])
+
+        self.write(self.update("harvesters", **{"2": "full"}))
+        self.assertTrue(self.store.reload())
+        self.assertEqual(self.store.version, 2)
+        self.assertEqual(self.versions, [2])
+
+    def test_snapshot(self):
+        snapshot = self.store.snapshot()
+        self.assertIs(self.store.snapshot(), snapshot)
+        self.write(self.update("rovers", **{"2": "stall", "3": "stall", "4": "stall"}))
+        self.store.reload()
+
+        self.assertEqual(snapshot.version, 1)
+        self.assertEqual(snapshot.get_ids("rovers", "available"), ("2", "3", "4"))
+        self.assertEqual(snapshot.get_status("rovers", "2"), "available")
+        new_snapshot = self.store.snapshot()
+        self.assertEqual(new_snapshot.version, 2)
+        self.assertEqual(new_snapshot.get_ids("rovers", "available"), ())
+        self.assertEqual(new_snapshot.get_ids("rovers", "stall"), ("2", "3", "4"))
+        self.assertEqual(new_snapshot.get_all_ids("rovers"), ("1", "2", "3", "4"))
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,5 @@
+#! /bin/sh
+
+export PYTHONPATH=../../src:$PYTHONPATH
+
+python3 -m templatey.brain_snapshot --config ../../config/xnix/config.sanic.yaml --cformat yaml --logging ../../config/xnix/logging.yaml
@@ -0,0 +1,135 @@
+import os
+import threading
+import time
+
+from programy.parser.aiml_parser import AIMLParser
+from programy.parser.exceptions import DuplicateGrammarException, ParserException
+from programy.storage.factory import StorageFactory
+from programy.utils.logging.ylogger import YLogger
+
+
+def file_signature(path):
+    try:
+        stat = os.stat(path)
+    except OSError:
+        return None
+    return stat.st_mtime_ns, stat.st_size
+
+
+def categories_signature(storage_factory):
+    """Signatures of all files under the categories storage, any AIML change changes it"""
+    if not storage_factory.entity_storage_engine_available(StorageFactory.CATEGORIES):
+        return {}
+    configuration = storage_factory.entity_storage_engine(StorageFactory.CATEGORIES).configuration
+    signature = {}
+    for path in configuration.categories_storage.dirs:
+        if os.path.isdir(path):
+            for root, _, files in os.walk(path):
+                for filename in files:
+                    signature[os.path.join(root, filename)] = file_signature(os.path.join(root, filename))
+        else:
+            signature[path] = file_signature(path)
+    return signature
+
+
+class ReloadableAIMLParser(AIMLParser):
+    """
+    AIMLParser keeping the categories parsed from every AIML file with the signature of the file.
+
+    A parser made from the previous one parses only the files changed since, categories of the other files
+    are put to its graph as they were parsed: with the same elements and templates and in the same
+    order of files, so the graph, duplicates included, is the same a full parse gives.
+    """
+
+    def __init__(self, brain, previous_files=None):
+        AIMLParser.__init__(self, brain)
+        self._files = {}
+        self._previous_files = previous_files or {}
+        self._file_categories = None
+        self.n_parsed_files = 0
+        self.n_reused_files = 0
+
+    @property
+    def files(self):
+        return self._files
+
+    def load_aiml(self):
+        AIMLParser.load_aiml(self)
+        self._previous_files = {}
+
+    def parse_from_file(self, filename, userid="*"):
+        signature = file_signature(filename)
+        previous = self._previous_files.get(filename)
+        if previous is not None and previous[0] == signature:
+            self._add_categories(filename, previous[1])
+            self._files[filename] = previous
+            self.n_reused_files += 1
+            return
+
+        self._file_categories = []
+        try:
+            AIMLParser.parse_from_file(self, filename, userid=userid)
+        finally:
+            self._files[filename] = (signature, self._file_categories)
+            self._file_categories = None
+        self.n_parsed_files += 1
+
+    def parse_category(self, category_xml, namespace, topic_element=None, add_to_graph=True, userid="*"):
+        category = AIMLParser.parse_category(self, category_xml, namespace, topic_element, False, userid)
+        # categories learnt while the bot runs are not in files and are not kept
+        if self._file_categories is not None:
+            self._file_categories.append((category_xml, category, userid))
+        if add_to_graph is True:
+            self._pattern_parser.add_pattern_to_graph(*category, userid=userid)
+            self._num_categories += 1
+        return category
+
+    def _add_categories(self, filename, categories):
+        for category_xml, category, userid in categories:
+            try:
+                self._pattern_parser.add_pattern_to_graph(*category, userid=userid)
+                self._num_categories += 1
+
+            except DuplicateGrammarException as dupe_excep:
+                self.handle_aiml_duplicate(dupe_excep, filename, category_xml)
+
+            except ParserException as parser_excep:
+                self.handle_aiml_error(parser_excep, filename, category_xml)
+
+
+class CategoriesWatcher(threading.Thread):
+    """
+    Reloads AIML of the brains of the client when files under the categories storage change.
+    Threads do not survive the fork of sanic workers, every worker starts its own watcher.
+    """
+
+    def __init__(self, client, interval=2.0):
+        threading.Thread.__init__(self, name="CategoriesWatcher", daemon=True)
+        self._client = client
+        self._interval = interval
+        self._signature = categories_signature(client.storage_factory)
+
+    def run(self):
+        while True:
+            time.sleep(self._interval)
+            signature = categories_signature(self._client.storage_factory)
+            if signature == self._signature:
+                continue
+            self._signature = signature
+            try:
+                reload_aiml(self._client)
+            except Exception as excep:
+                YLogger.exception(None, "Failed to reload AIML", excep)
+
+
+def client_brains(client):
+    brains = []
+    for botid in client.bot_factory.botids():
+        brain_factory = client.bot_factory.bot(botid).brain_factory
+        brains.extend(brain_factory.brain(brainid) for brainid in brain_factory.brainids())
+    return brains
+
+
+def reload_aiml(client):
+    """Reloads AIML of all brains of the client, returns reload stats of every brain"""
+    return [brain.reload_aiml() for brain in client_brains(client)]
@@ -0,0 +1,263 @@
+import hashlib
+import os
+import pickle
+import sys
+import threading
+import time
+
+import programy.brainfactory
+from programy.brain import Brain
+from programy.clients.client import BotClient
+from programy.clients.restful.sanic.config import SanicRestConfiguration
+from programy.storage.factory import StorageFactory
+from programy.utils.logging.ylogger import YLogger
+
+from templatey.aiml_reload import ReloadableAIMLParser
+
+# bump it when the way the brain is pickled changes
+SNAPSHOT_VERSION = 2
+
+# storage entities the snapshotted part of the brain is loaded from, with their file store configurations
+SOURCE_STORAGES = {
+    StorageFactory.CATEGORIES: "categories_storage",
+    StorageFactory.LEARNF: "learnf_storage",
+    StorageFactory.SETS: "sets_storage",
+    StorageFactory.MAPS: "maps_storage",
+    StorageFactory.RDF: "rdf_storage",
+    StorageFactory.DENORMAL: "denormal_storage",
+    StorageFactory.NORMAL: "normal_storage",
+    StorageFactory.GENDER: "gender_storage",
+    StorageFactory.PERSON: "person_storage",
+    StorageFactory.PERSON2: "person2_storage",
+    StorageFactory.REGEX_TEMPLATES: "regex_storage",
+    StorageFactory.PROPERTIES: "properties_storage",
+    StorageFactory.DEFAULTS: "defaults_storage",
+    StorageFactory.PATTERN_NODES: "pattern_nodes_storage",
+    StorageFactory.TEMPLATE_NODES: "template_nodes_storage",
+    StorageFactory.PREPROCESSORS: "preprocessors_storage",
+    StorageFactory.POSTPROCESSORS: "postprocessors_storage",
+}
+
+# what Brain.load builds from the sources: the pattern graph with templates and the collections
+SNAPSHOT_ATTRIBUTES = [
+    "_aiml_parser",
+    "_denormal_collection",
+    "_normal_collection",
+    "_gender_collection",
+    "_person_collection",
+    "_person2_collection",
+    "_rdf_collection",
+    "_sets_collection",
+    "_maps_collection",
+    "_properties_collection",
+    "_default_variables_collection",
+    "_preprocessors",
+    "_postprocessors",
+    "_regex_templates",
+]
+
+
+def source_files(storage_factory):
+    """
+    Returns paths of the files the brain is loaded from, None if some of them are not kept in files.
+    Directories are listed with all their subdirectories.
+    """
+    paths = set()
+    for entity, storage_name in SOURCE_STORAGES.items():
+        if not storage_factory.entity_storage_engine_available(entity):
+            continue
+        engine_configuration = storage_factory.entity_storage_engine(entity).configuration
+        store_configuration = getattr(engine_configuration, storage_name, None)
+        if store_configuration is None:
+            return None
+        for path in store_configuration.dirs:
+            if os.path.isdir(path):
+                for root, _, files in os.walk(path):
+                    paths.update(os.path.join(root, filename) for filename in files)
+            elif os.path.isfile(path):
+                paths.add(path)
+    return sorted(os.path.abspath(path) for path in paths)
+
+
+def content_hash(paths):
+    """Hash of the snapshot format, Python version, paths and contents of the source files"""
+    digest = hashlib.sha256()
+    digest.update(f"{SNAPSHOT_VERSION} {sys.version_info[:2]}".encode())
+    for path in paths:
+        digest.update(path.encode())
+        with open(path, "rb") as f:
+            digest.update(hashlib.sha256(f.read()).digest())
+    return digest.hexdigest()
+
+
+class _SnapshotPickler(pickle.Pickler):
+    # nodes of the graph refer to the brain, the bot and the client, they are the ones of the loading process
+    def __init__(self, file, brain):
+        pickle.Pickler.__init__(self, file, pickle.HIGHEST_PROTOCOL)
+        self._external = {id(brain): "brain", id(brain.bot): "bot", id(brain.bot.client): "client"}
+
+    def persistent_id(self, obj):
+        return self._external.get(id(obj))
+
+
+class _SnapshotUnpickler(pickle.Unpickler):
+    def __init__(self, file, brain):
+        pickle.Unpickler.__init__(self, file)
+        self._external = {"brain": brain, "bot": brain.bot, "client": brain.bot.client}
+
+    def persistent_load(self, pid):
+        return self._external[pid]
+
+
+class BrainSnapshot(object):
+    """
+    Pickled pattern graph and collections of the brain, so the bot starts without parsing AIML.
+
+    The snapshot is kept with the content hash of the files the brain is loaded from and is used only
+    while the hash matches, any change of the categories, sets, maps or lookups makes the brain parsed again.
+    """
+
+    def __init__(self, path, sources):
+        self._path = path
+        self._sources = sources
+
+    @staticmethod
+    def from_storage(storage_factory):
+        """Snapshot of the brain in binaries storage of the bot, None if the brain is not loaded from files"""
+        if not storage_factory.entity_storage_engine_available(StorageFactory.BINARIES):
+            return None
+        engine_configuration = storage_factory.entity_storage_engine(StorageFactory.BINARIES).configuration
+        sources = source_files(storage_factory)
+        if sources is None:
+            return None
+        return BrainSnapshot(engine_configuration.binaries_storage.file, sources)
+
+    @property
+    def path(self):
+        return self._path
+
+    def restore(self, brain):
+        """Puts the snapshotted part of the brain to `brain`, returns False if the snapshot is missing or stale"""
+        if not os.path.isfile(self._path):
+            return False
+        with open(self._path, "rb") as f:
+            header = pickle.load(f)
+            if header != {"version": SNAPSHOT_VERSION, "hash": content_hash(self._sources)}:
+                YLogger.info(brain, "Brain snapshot [%s] is stale", self._path)
+                return False
+            attributes = _SnapshotUnpickler(f, brain).load()
+        # AIMLParser pickles itself without the brain and the debug files of errors and duplicates
+        aiml_parser = attributes["_aiml_parser"]
+        aiml_parser._brain = brain
+        aiml_parser.__dict__.setdefault("_errors", None)
+        aiml_parser.__dict__.setdefault("_duplicates", None)
+        brain.__dict__.update(attributes)
+        return True
+
+    def save(self, brain):
+        header = {"version": SNAPSHOT_VERSION, "hash": content_hash(self._sources)}
+        attributes = {name: brain.__dict__[name] for name in SNAPSHOT_ATTRIBUTES}
+        os.makedirs(os.path.dirname(os.path.abspath(self._path)), exist_ok=True)
+        # workers starting together must not read a half written snapshot
+        tmp_path = f"{self._path}.{os.getpid()}.tmp"
+        try:
+            with open(tmp_path, "wb") as f:
+                pickle.dump(header, f, pickle.HIGHEST_PROTOCOL)
+                _SnapshotPickler(f, brain).dump(attributes)
+            os.replace(tmp_path, self._path)
+        finally:
+            if os.path.exists(tmp_path):
+                os.remove(tmp_path)
+
+
+class SnapshotBrain(Brain):
+    """
+    Brain restored from the snapshot in binaries storage when `load_binary` of the brain configuration is on.
+    The snapshot is made after the brain is parsed when `save_binary` is on.
+
+    Unlike programy binaries, the snapshot has the collections and pre/postprocessors too,
+    services, security, oob and dynamics are always loaded from the configuration.
+
+    AIML is reloaded without a restart by `reload_aiml`.
+    """
+
+    def __init__(self, bot, configuration):
+        self._reload_lock = threading.Lock()
+        self.last_reload = None
+        Brain.__init__(self, bot, configuration)
+
+    def load_aiml_parser(self):
+        self._load_pattern_nodes()
+        self._load_template_nodes()
+        return ReloadableAIMLParser(self)
+
+    def reload_aiml(self):
+        """
+        Parses AIML files changed since the last load to a new graph and swaps it for the current one.
+        Questions asked meanwhile are answered by the current graph. Returns the reload stats.
+        """
+        with self._reload_lock:
+            start = time.time()
+            aiml_parser = ReloadableAIMLParser(self, self._aiml_parser.files)
+            aiml_parser.load_aiml()
+            self._aiml_parser = aiml_parser
+            self.last_reload = {
+                "duration": time.time() - start,
+                "parsed_files": aiml_parser.n_parsed_files,
+                "reused_files": aiml_parser.n_reused_files,
+                "categories": aiml_parser.num_categories,
+            }
+        YLogger.info(self, "AIML reloaded: %s", self.last_reload)
+        return self.last_reload
+
+    def load(self, configuration):
+        binaries = configuration.binaries
+        snapshot = None
+        if binaries.load_binary or binaries.save_binary:
+            snapshot = BrainSnapshot.from_storage(self.bot.client.storage_factory)
+
+        restored = False
+        if snapshot is not None and binaries.load_binary:
+            start = time.time()
+            try:
+                restored = snapshot.restore(self)
+            except Exception as excep:
+                YLogger.exception(self, "Failed to load brain snapshot", excep)
+                if not binaries.load_aiml_on_binary_fail:
+                    raise
+            if restored:
+                YLogger.info(self, "Brain restored from [%s] in %.2f secs", snapshot.path, time.time() - start)
+
+        if not restored:
+            self.load_aiml()
+            self.load_collections()
+            self.load_regex_templates()
+            if snapshot is not None and binaries.save_binary:
+                try:
+                    snapshot.save(self)
+                    YLogger.info(self, "Brain snapshot saved to [%s]", snapshot.path)
+                except Exception as excep:
+                    YLogger.exception(self, "Failed to save brain snapshot", excep)
+
+        self.load_services(configuration)
+        self.load_security_services()
+        self._oobhandler.load_oob_processors()
+        self.load_dynamics()
+
+
+def use_brain_snapshots():
+    """Makes the bots created after it use SnapshotBrain, programy creates brains of its own class only"""
+    programy.brainfactory.Brain = SnapshotBrain
+
+
+class SnapshotBuildClient(BotClient):
+    """Loads the bot of the rest client configuration, so the brain snapshot is made once at the build"""
+
+    def get_client_configuration(self):
+        return SanicRestConfiguration("rest")
+
+
+if __name__ == "__main__":
+    # python3 -m templatey.brain_snapshot --config ../../config/xnix/config.sanic.yaml --cformat yaml
+    use_brain_snapshots()
+    SnapshotBuildClient("snapshot")
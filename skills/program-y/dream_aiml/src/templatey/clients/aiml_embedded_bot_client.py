@@ -8,6 +8,7 @@ from programy.utils.license.keys import LicenseKeys
 from programy.utils.substitutions.substitues import Substitutions
 from programy.clients.botfactory import BotFactory
 from programy.clients.events.console.config import ConsoleConfiguration
+from templatey.brain_snapshot import use_brain_snapshots
 
 
 class AIMLEmbeddedBotClient(BotClient):
@@ -88,6 +89,8 @@ class AIMLEmbeddedBotClient(BotClient):
         sys.path.append(src_root_path)
         ##############################################################################
 
+        # the brain is restored from its snapshot if the AIML is not changed since it was made
+        use_brain_snapshots()
         self._bot_factory = BotFactory(self, self.configuration.client_configuration)
 
         self.load_license_keys()
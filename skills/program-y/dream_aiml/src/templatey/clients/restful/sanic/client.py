@@ -25,6 +25,7 @@ TORT OR OTHERWISE, ARISING FROM, OUT OF OR IN CONNECTION WITH THE SOFTWARE OR TH
 # Sanic is not supported on windows due to a dependency on
 # uvloop. This code will not run on Windows
 #
+import os
 import re
 
 from sanic import Sanic
@@ -37,12 +38,23 @@ import sentry_sdk
 import uuid
 from sentry_sdk.integrations.logging import ignore_logger
 import string
+from templatey.aiml_reload import CategoriesWatcher, client_brains, reload_aiml
+from templatey.brain_snapshot import use_brain_snapshots
+from templatey.dialog.conversation_store import SQLiteConversationStore, new_utterances
 from templatey.processors.pre.normalizer import PreProcessor
 
 
 ignore_logger("root")
 # TODO: Get if from config.sanic.yml
 NULL_RESPONSE = "Sorry, I don't have an answer for that!"
+# conversations are shared by all workers of the service, dialogs idle for CONVERSATIONS_TTL seconds are deleted
+CONVERSATIONS_PATH = os.getenv("PROGRAMY_CONVERSATIONS_PATH", "../../storage/conversations/conversations.sqlite")
+CONVERSATIONS_TTL = float(os.getenv("PROGRAMY_CONVERSATIONS_TTL", 86400))
+# "incremental" asks only utterances new to the saved conversation of the dialog and replays the dialog
+# if there is no one, "replay" asks all utterances of the request in a new conversation every turn
+DIALOG_MODE = os.getenv("PROGRAMY_DIALOG_MODE", "incremental")
+# every worker checks the categories storage for changed AIML every RELOAD_INTERVAL seconds, 0 turns it off
+RELOAD_INTERVAL = float(os.getenv("PROGRAMY_RELOAD_INTERVAL", 2))
 
 
 def remove_punct(s):
@@ -76,8 +88,11 @@ def create_amazon_ssml_markup(text):
 
 class SanicRestBotClient(RestBotClient):
     def __init__(self, id, argument_parser=None):
+        # the brain is restored from its snapshot if the AIML is not changed since it was made
+        use_brain_snapshots()
         RestBotClient.__init__(self, id, argument_parser)
         self.preprocesser = PreProcessor(fpath="../../storage/lookups/normal.txt")
+        self.conversations = SQLiteConversationStore(CONVERSATIONS_PATH, ttl=CONVERSATIONS_TTL)
 
     def get_client_configuration(self):
         return SanicRestConfiguration("rest")
@@ -100,17 +115,34 @@ class SanicRestBotClient(RestBotClient):
             if response is not None:
                 return response, status
             responses = []
-            for user_sentences in request.json["sentences_batch"]:
+            sentences_batch = request.json["sentences_batch"]
+            dialog_ids = request.json.get("dialog_ids") or [None] * len(sentences_batch)
+            utterances_counts = request.json.get("utterances_counts") or [None] * len(sentences_batch)
+            for user_sentences, dialog_id, n_utterances in zip(sentences_batch, dialog_ids, utterances_counts):
+                last_utterance = user_sentences[-1]
                 replace_phrases = ["thanks.", "thank you.", "please."]
                 for phrase in replace_phrases:
                     if user_sentences[-1] != phrase:
                         user_sentences[-1] = user_sentences[-1].replace(phrase, "").strip()
 
-                userid = uuid.uuid4().hex
+                userid = uuid.uuid4().hex if dialog_id is None else str(dialog_id)
+                client_context = self.create_client_context(userid)
+                sentences = None
+                if DIALOG_MODE == "incremental" and dialog_id is not None:
+                    seen, last_seen = self.conversations.load(client_context)
+                    sentences = new_utterances(user_sentences, n_utterances, seen, last_seen)
+                if sentences is None:
+                    # context of the dialog is rebuilt from its last utterances
+                    client_context.bot.conversations.conversations.pop(userid, None)
+                    sentences = user_sentences
                 # if user said let's chat at beginning of a dialogue, that we should response with greeting
-                for i, s in enumerate(user_sentences):
+                for i, s in enumerate(sentences):
                     # s = s if i != 0 else f"BEGIN_USER_UTTER {s}"
                     answer = self.ask_question(userid, self.preprocesser.process(s))
+                if dialog_id is None:
+                    client_context.bot.conversations.conversations.pop(userid, None)
+                else:
+                    self.conversations.save(client_context, n_utterances, last_utterance)
 
                 if "DEFAULT_SORRY_RESPONCE" in answer:
                     answer = (
@@ -132,8 +164,9 @@ class SanicRestBotClient(RestBotClient):
                 else:
                     confidence = 0
                 print(
-                    "user_id: {}; user_sentences: {}; curr_user_sentence: {} answer: {}; ssml_tagged_text: {}".format(
-                        userid, user_sentences, user_sentences[-1], untagged_text, ssml_tagged_text
+                    "user_id: {}; user_sentences: {}; asked: {}; curr_user_sentence: {} answer: {}; "
+                    "ssml_tagged_text: {}".format(
+                        userid, user_sentences, len(sentences), user_sentences[-1], untagged_text, ssml_tagged_text
                     )
                 )
 
@@ -143,6 +176,10 @@ class SanicRestBotClient(RestBotClient):
             sentry_sdk.capture_exception(excep)
             return self.format_error_response(userid, question, str(excep)), 500
 
+    def reload_aiml(self):
+        """Parses changed AIML files and swaps the graphs of the brains, returns the reload stats"""
+        return reload_aiml(self)
+
     def run(self, sanic):
 
         print(
@@ -199,6 +236,20 @@ if __name__ == "__main__":
         response, status = REST_CLIENT.process_request(request)
         return REST_CLIENT.create_response(response, status=status)
 
+    @APP.route("/api/rest/v1.0/reload", methods=["GET", "POST"])
+    async def reload(request):
+        # the worker keeps answering questions while AIML is reloaded in the executor
+        if request.method == "POST":
+            stats = await request.app.loop.run_in_executor(None, REST_CLIENT.reload_aiml)
+        else:
+            stats = [brain.last_reload for brain in client_brains(REST_CLIENT)]
+        return json({"pid": os.getpid(), "reloads": stats})
+
+    @APP.listener("after_server_start")
+    async def start_categories_watcher(app, loop):
+        if RELOAD_INTERVAL > 0:
+            CategoriesWatcher(REST_CLIENT, RELOAD_INTERVAL).start()
+
     print("Loading CUSTOM VERSION, please wait...")
     REST_CLIENT = SanicRestBotClient("sanic")
     REST_CLIENT.run(APP)
@@ -0,0 +1,154 @@
+import json
+import os
+import sqlite3
+import threading
+import time
+
+from programy.dialog.conversation import Conversation
+from programy.dialog.question import Question
+from programy.dialog.sentence import Sentence
+
+
+def new_utterances(utterances, n_utterances, seen, last_seen):
+    """
+    Returns the utterances the conversation has not seen yet, taken from the end of `utterances`,
+    the last of `n_utterances` utterances of the dialog. The conversation has seen `seen` utterances,
+    `last_seen` is the last of them. Returns None if some new utterances are not in `utterances`
+    or the conversation does not continue the dialog, then the dialog is replayed.
+    """
+    if n_utterances is None or seen is None:
+        return None
+    n_new = n_utterances - seen
+    if n_new <= 0 or n_new > len(utterances):
+        return None
+    if n_new < len(utterances) and utterances[-n_new - 1] != last_seen:
+        return None
+    return utterances[-n_new:]
+
+
+class SQLiteConversationStore(object):
+    """
+    Conversations of program-y kept in SQLite by user id, so a dialog started by one worker of the service
+    is continued by any other.
+
+    Unlike the JSON of programy conversation storage, the state keeps everything AIML reads from
+    the conversation: properties (topic and variables set by categories) and questions with their
+    sentences and responses (that). Matched contexts are not kept, they are used by the current
+    sentence only.
+
+    The conversation is loaded to the bot before the turn and is dropped from the memory of the worker
+    after it is saved, so workers never answer from a stale copy. With the conversation the number of
+    utterances of the dialog it has seen and the last of them are saved, so the next turn can ask
+    only the utterances which are new to it.
+    """
+
+    PURGE_EVERY = 1000
+
+    def __init__(self, path, ttl=86400):
+        self._path = path
+        self._ttl = ttl
+        self._n_saved = 0
+        self._conn = None
+        self._pid = None
+        self._lock = threading.Lock()
+        os.makedirs(os.path.dirname(os.path.abspath(path)), exist_ok=True)
+
+    def _connection(self):
+        # sanic forks workers after the client is created, every process opens its own connection
+        if self._pid != os.getpid():
+            self._conn = sqlite3.connect(self._path, timeout=10, check_same_thread=False)
+            self._conn.execute("PRAGMA journal_mode=WAL")
+            self._conn.execute(
+                "CREATE TABLE IF NOT EXISTS conversations "
+                "(id TEXT PRIMARY KEY, state TEXT, utterances INTEGER, last_utterance TEXT, updated REAL)"
+            )
+            self._conn.commit()
+            self._pid = os.getpid()
+        return self._conn
+
+    @staticmethod
+    def conversation_to_state(conversation):
+        return {
+            "properties": conversation.properties,
+            "questions": [
+                {
+                    "srai": question._srai,
+                    "properties": question._properties,
+                    "current_sentence_no": question._current_sentence_no,
+                    "sentences": [
+                        {
+                            "words": sentence.words,
+                            "response": sentence.response,
+                            "positivity": sentence.positivity,
+                            "subjectivity": sentence.subjectivity,
+                        }
+                        for sentence in question.sentences
+                    ],
+                }
+                for question in conversation.questions
+            ],
+        }
+
+    @staticmethod
+    def state_to_conversation(client_context, state):
+        conversation = Conversation(client_context)
+        conversation._properties = state["properties"]
+        for json_question in state["questions"]:
+            question = Question(json_question["srai"])
+            question._properties = json_question["properties"]
+            question._current_sentence_no = json_question["current_sentence_no"]
+            for json_sentence in json_question["sentences"]:
+                sentence = Sentence(client_context.brain.tokenizer)
+                sentence._words = json_sentence["words"]
+                sentence.response = json_sentence["response"]
+                sentence.positivity = json_sentence["positivity"]
+                sentence.subjectivity = json_sentence["subjectivity"]
+                question.sentences.append(sentence)
+            conversation.questions.append(question)
+        return conversation
+
+    def load(self, client_context):
+        """
+        Puts the saved conversation of the user to the bot.
+        Returns the number of utterances of the dialog the conversation has seen and the last of them,
+        `(None, None)` if there is no conversation.
+        """
+        with self._lock:
+            row = (
+                self._connection()
+                .execute(
+                    "SELECT state, utterances, last_utterance FROM conversations WHERE id = ?",
+                    (client_context.userid,),
+                )
+                .fetchone()
+            )
+        conversations = client_context.bot.conversations.conversations
+        if row is None:
+            conversations.pop(client_context.userid, None)
+            return None, None
+        state, utterances, last_utterance = row
+        conversations[client_context.userid] = self.state_to_conversation(client_context, json.loads(state))
+        return utterances, last_utterance
+
+    def save(self, client_context, utterances=None, last_utterance=None):
+        """Saves the conversation of the user and drops it from the bot"""
+        conversation = client_context.bot.conversations.conversations.pop(client_context.userid, None)
+        if conversation is None:
+            return
+        state = json.dumps(self.conversation_to_state(conversation))
+        with self._lock:
+            conn = self._connection()
+            conn.execute(
+                "INSERT OR REPLACE INTO conversations VALUES (?, ?, ?, ?, ?)",
+                (client_context.userid, state, utterances, last_utterance, time.time()),
+            )
+            self._n_saved += 1
+            if self._n_saved % self.PURGE_EVERY == 0:
+                conn.execute("DELETE FROM conversations WHERE updated < ?", (time.time() - self._ttl,))
+            conn.commit()
+
+    def delete(self, userid):
+        with self._lock:
+            conn = self._connection()
+            conn.execute("DELETE FROM conversations WHERE id = ?", (userid,))
+            conn.commit()
@@ -0,0 +1,50 @@
+from collections import deque
+
+
+class AhoCorasickAutomaton(object):
+    """
+    Aho-Corasick automaton telling which of the patterns occur in a text in one scan of it.
+
+    Transitions of every state are resolved at build time through the failure links,
+    so a scan makes one dict lookup per character of the text.
+    """
+
+    def __init__(self, patterns):
+        goto = [{}]
+        outputs = [set()]
+        for pattern_id, pattern in enumerate(patterns):
+            state = 0
+            for char in pattern:
+                if char not in goto[state]:
+                    goto.append({})
+                    outputs.append(set())
+                    goto[state][char] = len(goto) - 1
+                state = goto[state][char]
+            outputs[state].add(pattern_id)
+
+        # states are visited breadth-first, so the failure state of a state is always resolved before it
+        fail = [0] * len(goto)
+        delta = [None] * len(goto)
+        delta[0] = goto[0]
+        queue = deque(goto[0].values())
+        while queue:
+            state = queue.popleft()
+            delta[state] = {**delta[fail[state]], **goto[state]}
+            outputs[state] |= outputs[fail[state]]
+            for char, next_state in goto[state].items():
+                fail[next_state] = delta[fail[state]].get(char, 0) if state else 0
+                queue.append(next_state)
+
+        self._delta = delta
+        self._outputs = [tuple(sorted(state_outputs)) for state_outputs in outputs]
+
+    def find(self, text):
+        """Returns ids of the patterns occurring in the text"""
+        delta, outputs = self._delta, self._outputs
+        state = 0
+        found = set()
+        for char in text:
+            state = delta[state].get(char, 0)
+            if outputs[state]:
+                found.update(outputs[state])
+        return found
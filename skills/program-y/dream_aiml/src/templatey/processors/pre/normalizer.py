@@ -1,17 +1,43 @@
 from programy.processors.processing import Processor
 
+from templatey.processors.pre.aho_corasick import AhoCorasickAutomaton
+
 
 class PreProcessor(Processor):
+    """
+    Replaces the pairs of normal.txt one after another, as `str.replace` of every pair would do.
+
+    The pairs occurring in the sentence are found in one scan of the Aho-Corasick automaton and only they
+    are replaced: the others would not change the sentence. A replacement can make later pairs occur,
+    so the sentence is scanned again after every change.
+    """
+
     def __init__(self, fpath="./dream_aiml/storage/lookups/normal.txt"):
         Processor.__init__(self)
         self.patterns = []
         with open(fpath, "r") as f:
             self.patterns = f.read().splitlines()
         self.patterns = [raw[1:-1].split('","') for raw in self.patterns]
+        self._automaton = AhoCorasickAutomaton([pattern for pattern, _ in self.patterns])
 
-    def process(self, string):
+    def process_sequential(self, string):
+        """Reference implementation, replaces all pairs one by one."""
         for pattern in self.patterns:
             new_string = string.replace(pattern[0], pattern[1])
             if new_string != string:
                 string = new_string
         return string
+
+    def process(self, string):
+        found = self._automaton.find(string)
+        last = -1
+        while True:
+            # the next pair occurring in the sentence, pairs between are not in it
+            i = min((pattern_id for pattern_id in found if pattern_id > last), default=None)
+            if i is None:
+                return string
+            last = i
+            new_string = string.replace(*self.patterns[i])
+            if new_string != string:
+                string = new_string
+                found = self._automaton.find(string)
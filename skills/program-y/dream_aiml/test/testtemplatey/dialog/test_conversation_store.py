@@ -0,0 +1,81 @@
+import os
+import random
+import sys
+import tempfile
+import unittest
+import uuid
+
+# ################ Enable code imports ##########################################
+SELF_DIR = os.path.dirname(os.path.abspath(__file__))
+ROOT_DIR = os.path.dirname(os.path.dirname(os.path.dirname(SELF_DIR)))
+SRC_ROOT_DIR = ROOT_DIR + "/src"
+sys.path.append(SRC_ROOT_DIR)
+# #####################################################
+from templatey.clients.aiml_embedded_bot_client import AIMLEmbeddedBotClient  # noqa
+from templatey.dialog.conversation_store import SQLiteConversationStore, new_utterances  # noqa
+
+CONFIG_PATH = ROOT_DIR + "/config/xnix/config.yaml"
+
+DIALOG = ["hello", "how are you", "yes", "what is your name", "no", "let's chat", "i like music"]
+
+
+class TestSQLiteConversationStore(unittest.TestCase):
+    @classmethod
+    def setUpClass(cls):
+        cls.client = AIMLEmbeddedBotClient(id="koni", config_file_path=CONFIG_PATH)
+        cls.tmp_dir = tempfile.TemporaryDirectory()
+
+    @classmethod
+    def tearDownClass(cls):
+        cls.tmp_dir.cleanup()
+
+    def test_dialog_continues_after_reload(self):
+        self.maxDiff = None
+        store = SQLiteConversationStore(os.path.join(self.tmp_dir.name, "conversations.sqlite"))
+        # conversations of config.yaml are saved to files, users are new in every run
+        in_memory_user, stored_user = uuid.uuid4().hex, uuid.uuid4().hex
+        for turn, text in enumerate(DIALOG):
+            # both users get the same answers of <random>
+            random.seed(turn)
+            expected = self.client.handle_user_message(in_memory_user, text)
+
+            client_context = self.client.create_client_context(stored_user)
+            store.load(client_context)
+            random.seed(turn)
+            response = self.client.process_question(client_context, text)
+            state = store.conversation_to_state(client_context.bot.get_conversation(client_context))
+            store.save(client_context)
+            self.assertNotIn(stored_user, client_context.bot.conversations.conversations)
+
+            self.assertEqual(response, expected, f"turn {turn}: {text}")
+            expected_client_context = self.client.create_client_context(in_memory_user)
+            expected_state = store.conversation_to_state(
+                expected_client_context.bot.get_conversation(expected_client_context)
+            )
+            self.assertEqual(state, expected_state)
+
+    def test_missing_conversation(self):
+        store = SQLiteConversationStore(os.path.join(self.tmp_dir.name, "conversations.sqlite"))
+        new_user = uuid.uuid4().hex
+        client_context = self.client.create_client_context(new_user)
+        self.assertEqual(store.load(client_context), (None, None))
+        self.client.process_question(client_context, "hello")
+        store.save(client_context, 1, "hello")
+        self.assertEqual(store.load(self.client.create_client_context(new_user)), (1, "hello"))
+        store.delete(new_user)
+        self.assertEqual(store.load(self.client.create_client_context(new_user)), (None, None))
+
+    def test_new_utterances(self):
+        utterances = ["hi", "hello", "how are you", "fine", "yes"]
+        self.assertEqual(new_utterances(utterances, 7, 5, "how are you"), ["fine", "yes"])
+        self.assertEqual(new_utterances(utterances, 7, 2, None), utterances)
+        # the conversation is missing, too old or does not continue the dialog
+        self.assertIsNone(new_utterances(utterances, 7, None, None))
+        self.assertIsNone(new_utterances(utterances, 7, 1, "hi"))
+        self.assertIsNone(new_utterances(utterances, 7, 5, "hello"))
+        self.assertIsNone(new_utterances(utterances, 7, 7, "yes"))
+        self.assertIsNone(new_utterances(utterances, None, 5, "how are you"))
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,36 @@
+import argparse
+import time
+
+from test_normalizer import NORMAL_PATH, SENTENCES, PreProcessor, make_corpus
+
+
+def bench(func, corpus):
+    st_time = time.time()
+    result = [func(text) for text in corpus]
+    return result, time.time() - st_time
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Compare sequential and Aho-Corasick normal.txt substitutions")
+    parser.add_argument("-n", "--n-sentences", type=int, default=100000)
+    args = parser.parse_args()
+
+    st_time = time.time()
+    preprocessor = PreProcessor(fpath=NORMAL_PATH)
+    print(f"load: {time.time() - st_time:.3f}s")
+
+    for name, corpus in [
+        ("dialog sentences", SENTENCES * (args.n_sentences // len(SENTENCES))),
+        ("mixes of pairs", make_corpus(preprocessor, args.n_sentences)),
+    ]:
+        old_result, old_time = bench(preprocessor.process_sequential, corpus)
+        new_result, new_time = bench(preprocessor.process, corpus)
+        mismatches = [(text, old, new) for text, old, new in zip(corpus, old_result, new_result) if old != new]
+        for text, old, new in mismatches[:10]:
+            print(f"MISMATCH {text!r}: {old!r} != {new!r}")
+        print(f"{name}: {len(corpus)} sentences, mismatches: {len(mismatches)}")
+        print(f"sequential: {old_time:.3f}s, automaton: {new_time:.3f}s, speedup: {old_time / new_time:.1f}x")
+
+
+if __name__ == "__main__":
+    main()
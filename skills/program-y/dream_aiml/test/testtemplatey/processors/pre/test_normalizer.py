@@ -0,0 +1,65 @@
+import os
+import random
+import sys
+import unittest
+
+# ################ Enable code imports ##########################################
+SELF_DIR = os.path.dirname(os.path.abspath(__file__))
+ROOT_DIR = os.path.dirname(os.path.dirname(os.path.dirname(os.path.dirname(SELF_DIR))))
+SRC_ROOT_DIR = ROOT_DIR + "/src"
+sys.path.append(SRC_ROOT_DIR)
+# #####################################################
+from templatey.processors.pre.aho_corasick import AhoCorasickAutomaton  # noqa
+from templatey.processors.pre.normalizer import PreProcessor  # noqa
+
+NORMAL_PATH = ROOT_DIR + "/storage/lookups/normal.txt"
+
+SENTENCES = [
+    "hello how are you doing today",
+    "what's up man, i don't know what u r talking about!!",
+    "i like music and movies. what about you?",
+    "tell me about the moon please",
+    "visit www.example.com or http://deepy.org/faq?q=1%20moon",
+    " ain t can t won t ",
+]
+WORDS = ["i", "you", "the", "moon", "rover", "is", "t", "s", "ll", "and", "but", "a.m.", "p.m.", "u.s.a.", "5"]
+SEPARATORS = ["", " ", " ", "  ", ".", ",", "'", "-", "?", "!"]
+
+
+def make_corpus(preprocessor, n_sentences=20000, seed=0):
+    """Random mixes of patterns, replacements and words, so replacements of pairs produce other pairs"""
+    rng = random.Random(seed)
+    vocab = WORDS + [text for pair in preprocessor.patterns for text in pair]
+    corpus = []
+    for _ in range(n_sentences):
+        corpus.append("".join(rng.choice(vocab) + rng.choice(SEPARATORS) for _ in range(rng.randint(1, 12))))
+    return corpus
+
+
+class TestAhoCorasickAutomaton(unittest.TestCase):
+    def test_find(self):
+        automaton = AhoCorasickAutomaton(["he", "she", "his", "hers", "s"])
+        self.assertEqual(automaton.find("ushers"), {0, 1, 3, 4})
+        self.assertEqual(automaton.find("this"), {2, 4})
+        self.assertEqual(automaton.find("xyz"), set())
+        self.assertEqual(automaton.find(""), set())
+
+
+class TestPreProcessor(unittest.TestCase):
+    @classmethod
+    def setUpClass(cls):
+        cls.preprocessor = PreProcessor(fpath=NORMAL_PATH)
+
+    def test_examples(self):
+        self.assertEqual(self.preprocessor.process("what's up"), "what is up")
+        self.assertEqual(self.preprocessor.process("hello"), "hello")
+
+    def test_parity(self):
+        for sentence in SENTENCES + make_corpus(self.preprocessor):
+            self.assertEqual(
+                self.preprocessor.process(sentence), self.preprocessor.process_sequential(sentence), repr(sentence)
+            )
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,102 @@
+import os
+import random
+import sys
+import tempfile
+import unittest
+import uuid
+
+# ################ Enable code imports ##########################################
+SELF_DIR = os.path.dirname(os.path.abspath(__file__))
+ROOT_DIR = os.path.dirname(os.path.dirname(SELF_DIR))
+SRC_ROOT_DIR = ROOT_DIR + "/src"
+sys.path.append(SRC_ROOT_DIR)
+# #####################################################
+from templatey.clients.aiml_embedded_bot_client import AIMLEmbeddedBotClient  # noqa
+from templatey.aiml_reload import ReloadableAIMLParser, reload_aiml  # noqa
+
+CONFIG_PATH = ROOT_DIR + "/config/xnix/config.yaml"
+
+QUESTIONS = ["hello", "how are you", "yes", "what is your name", "no", "let's chat", "i like music", "bye"]
+
+CATEGORY = "<category><pattern>%s</pattern><template>%s</template></category>"
+
+
+def graph_dump(aiml_parser):
+    lines = []
+    aiml_parser.pattern_parser.dump(output_func=lambda caller, line: lines.append(line))
+    return lines
+
+
+class TestAIMLReload(unittest.TestCase):
+    @classmethod
+    def setUpClass(cls):
+        cls.client = AIMLEmbeddedBotClient(id="koni", config_file_path=CONFIG_PATH)
+        cls.tmp_dir = tempfile.TemporaryDirectory()
+
+    @classmethod
+    def tearDownClass(cls):
+        cls.tmp_dir.cleanup()
+
+    def ask(self, questions):
+        # conversations of config.yaml are saved to files, the user is new in every run
+        userid = uuid.uuid4().hex
+        answers = []
+        for turn, question in enumerate(questions):
+            random.seed(turn)
+            answers.append(self.client.handle_user_message(userid, question))
+        return answers
+
+    def write_aiml(self, name, *categories):
+        path = os.path.join(self.tmp_dir.name, name)
+        with open(path, "w") as f:
+            f.write("<aiml>%s</aiml>" % "".join(CATEGORY % category for category in categories))
+        return path
+
+    def test_reload_of_unchanged_aiml(self):
+        brain = self.client.create_client_context("reload").brain
+        expected = self.ask(QUESTIONS)
+        aiml_parser = ReloadableAIMLParser(brain)
+        aiml_parser.load_aiml()
+
+        # files touched since the brain was loaded or snapshotted are parsed by the first reload
+        reload_aiml(self.client)
+        (stats,) = reload_aiml(self.client)
+        self.assertIsNot(brain.aiml_parser, aiml_parser)
+        self.assertEqual(stats["parsed_files"], 0)
+        self.assertEqual(stats["reused_files"], len(aiml_parser.files))
+        self.assertEqual(stats["categories"], aiml_parser.num_categories)
+        self.assertEqual(graph_dump(brain.aiml_parser), graph_dump(aiml_parser))
+        self.assertEqual(self.ask(QUESTIONS), expected)
+
+    def test_only_changed_files_are_parsed(self):
+        brain = self.client.create_client_context("reload").brain
+        first = self.write_aiml("first.aiml", ("RELOAD ONE", "one"), ("RELOAD TWO", "two"))
+        second = self.write_aiml("second.aiml", ("RELOAD TWO", "second two"), ("RELOAD THREE", "three"))
+        aiml_parser = ReloadableAIMLParser(brain)
+        aiml_parser.parse_from_file(first)
+        aiml_parser.parse_from_file(second)
+        self.assertEqual((aiml_parser.n_parsed_files, aiml_parser.num_categories), (2, 3))
+
+        os.utime(first, ns=(0, 0))
+        self.write_aiml("first.aiml", ("RELOAD ONE", "new one"))
+        reloaded = ReloadableAIMLParser(brain, aiml_parser.files)
+        reloaded.parse_from_file(first)
+        reloaded.parse_from_file(second)
+        self.assertEqual((reloaded.n_parsed_files, reloaded.n_reused_files), (1, 1))
+
+        parsed = ReloadableAIMLParser(brain)
+        parsed.parse_from_file(first)
+        parsed.parse_from_file(second)
+        self.assertEqual(reloaded.num_categories, 3)
+        self.assertEqual(graph_dump(reloaded), graph_dump(parsed))
+
+        # the category left in the second file only is not a duplicate anymore
+        aiml_parser, brain._aiml_parser = brain.aiml_parser, reloaded
+        try:
+            self.assertEqual(self.ask(["reload one", "reload two"]), ["New one.", "Second two."])
+        finally:
+            brain._aiml_parser = aiml_parser
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,71 @@
+import os
+import random
+import sys
+import tempfile
+import unittest
+import uuid
+
+# ################ Enable code imports ##########################################
+SELF_DIR = os.path.dirname(os.path.abspath(__file__))
+ROOT_DIR = os.path.dirname(os.path.dirname(SELF_DIR))
+SRC_ROOT_DIR = ROOT_DIR + "/src"
+sys.path.append(SRC_ROOT_DIR)
+# #####################################################
+from templatey.clients.aiml_embedded_bot_client import AIMLEmbeddedBotClient  # noqa
+from templatey.brain_snapshot import BrainSnapshot, SnapshotBrain, source_files  # noqa
+
+CONFIG_PATH = ROOT_DIR + "/config/xnix/config.yaml"
+
+QUESTIONS = ["hello", "how are you", "yes", "what is your name", "no", "let's chat", "i like music", "bye"]
+
+
+class TestBrainSnapshot(unittest.TestCase):
+    @classmethod
+    def setUpClass(cls):
+        cls.client = AIMLEmbeddedBotClient(id="koni", config_file_path=CONFIG_PATH)
+        cls.tmp_dir = tempfile.TemporaryDirectory()
+
+    @classmethod
+    def tearDownClass(cls):
+        cls.tmp_dir.cleanup()
+
+    def ask(self, questions):
+        # conversations of config.yaml are saved to files, the user is new in every run
+        userid = uuid.uuid4().hex
+        answers = []
+        for turn, question in enumerate(questions):
+            random.seed(turn)
+            answers.append(self.client.handle_user_message(userid, question))
+        return answers
+
+    def test_restored_brain_answers_as_parsed(self):
+        brain = self.client.create_client_context("snapshot").brain
+        self.assertIsInstance(brain, SnapshotBrain)
+        sources = source_files(self.client.storage_factory)
+        self.assertTrue(any(path.endswith(".aiml") for path in sources))
+
+        expected = self.ask(QUESTIONS)
+        snapshot = BrainSnapshot(os.path.join(self.tmp_dir.name, "brain.bin"), sources)
+        snapshot.save(brain)
+        aiml_parser = brain.aiml_parser
+        self.assertTrue(snapshot.restore(brain))
+        self.assertIsNot(brain.aiml_parser, aiml_parser)
+        self.assertIs(brain.aiml_parser.brain, brain)
+        self.assertEqual(self.ask(QUESTIONS), expected)
+
+    def test_stale_snapshot(self):
+        brain = self.client.create_client_context("snapshot").brain
+        source = os.path.join(self.tmp_dir.name, "source.aiml")
+        with open(source, "w") as f:
+            f.write("<aiml></aiml>")
+        snapshot = BrainSnapshot(os.path.join(self.tmp_dir.name, "stale.bin"), [source])
+        self.assertFalse(snapshot.restore(brain))
+        snapshot.save(brain)
+        self.assertTrue(snapshot.restore(brain))
+        with open(source, "w") as f:
+            f.write("<aiml><category></category></aiml>")
+        self.assertFalse(snapshot.restore(brain))
+
+
+if __name__ == "__main__":
+    unittest.main()